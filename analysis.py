@@ -1,20 +1,42 @@
+import argparse
 from collections import Counter
-import json
-from pathlib import Path
-import pickle
-import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
 import pandas as pd
-import requests
-from tqdm import tqdm
 
-SMOOTHINGPOOLADDR = '0xd4E96eF8eee8678dBFf4d535E033Ed1a4F7605b7'
+from balances import load_balances, nearest_index
+from beaconchain import fetch_relays, load_journal
+from bootstrap import N_RESAMPLES, bootstrap_sums, interval
+from incremental import WINDOW_COLS, proxy_max_bid, update_incremental_state
+from instrument import RunReport, worker_init
+from node_index import build_node_index
+from recipients import relay_recipients, reverify_correct_fee_recipient
+from slot_data import load_slots, needs_proxy_bid, prepare_slot_frame, select_shards, shard_index
+from toggles import detect_toggles
+
+# stages hand the slot frame along without defensive copies; copy-on-write keeps that safe
+pd.set_option('mode.copy_on_write', True)
+
 
 # max bid isn't always used (eg, bid gets in too late)
 #   It's been around 90%, but we get an empirical measure of the mean from the dataset
 BID2REWARD = None
+# Slot 5203679 is when the grace period ended; the default start of the analysed range
+PENALTY_START_SLOT = 5203679
+# most points drawn per SF curve, so plot time and size don't grow with the dataset
+MAX_PLOT_POINTS = 2000
+# loss_timeseries buckets: name -> (origin timestamp, length in seconds). Days and weeks are UTC
+# calendar ones (weeks from Monday); 28d buckets are a rewards interval long but counted from
+# PENALTY_START_SLOT, so they don't line up with the actual intervals
+BUCKETS = {
+    'epoch': (1606824023, 32 * 12),
+    'day': (0, 24 * 60 * 60),
+    'week': (4 * 24 * 60 * 60, 7 * 24 * 60 * 60),
+    '28d': (1606824023 + 12 * PENALTY_START_SLOT, 28 * 24 * 60 * 60),
+}
 """
 ===QUESTIONS TO ADDRESS FOR BOUNTY==
 Detail level
@@ -40,53 +62,40 @@ High level
 """
 
 
-def wei2eth(wei_str):
-    try:
-        return int(wei_str) / 1e18
-    except ValueError:
-        return np.nan
-
-
 def slot2timestamp(slot):
     return 1606824023 + 12 * slot
 
 
-def get_rethdict(start_slot, end_slot):
-    start_time = slot2timestamp(start_slot)
-    end_time = slot2timestamp(end_slot)
-    start_eth, start_reth, end_eth, end_reth = 0, 0, 0, 0
-
-    with open('./data/balances.jsonl', 'r') as f:
-        ls = [json.loads(line) for line in f]
-
-    timediff = 999999999
-    for _block, totalETH, _stakingEth, rethSupply, time in ls:
-        time = int(time, 16)
-        newtimediff = abs(time - start_time)
-        if newtimediff < timediff:
-            start_eth = int(totalETH, 16)
-            start_reth = int(rethSupply, 16)
-            timediff = newtimediff
-        if time > start_time:
-            break
-
-    timediff = 999999999
-    for _block, totalETH, _stakingEth, rethSupply, time in ls:
-        time = int(time, 16)
-        newtimediff = abs(time - end_time)
-        if newtimediff < timediff:
-            end_eth = int(totalETH, 16)
-            end_reth = int(rethSupply, 16)
-            timediff = newtimediff
-        if time > end_time:
-            break
+def timestamp2slot(timestamp):
+    """first slot at or after timestamp (scalar or array)"""
+    return -((1606824023 - np.asarray(timestamp, dtype=np.int64)) // 12)
+
+
+def date2slot(date_str):
+    """first slot at or after 00:00 UTC on date_str (YYYY-MM-DD)"""
+    timestamp = datetime.fromisoformat(date_str).replace(tzinfo=timezone.utc).timestamp()
+    return int(timestamp2slot(int(timestamp)))
+
+
+def get_rethdict(start_slot, end_slot, balances=None):
+    """rETH backing at the balance entries nearest to start_slot and end_slot
+
+    Works on scalars or on arrays of slots (then every value in the dict is an array), so
+    rethdict2apy(get_rethdict(starts, ends)) gives APY for many windows from one loaded series
+    """
+    if balances is None:
+        balances = load_balances()
+    start_time = slot2timestamp(np.asarray(start_slot))
+    end_time = slot2timestamp(np.asarray(end_slot))
+    start_ind = nearest_index(balances, start_time)
+    end_ind = nearest_index(balances, end_time)
 
     years = (end_time - start_time) / (60 * 60 * 24 * 365.25)
     return {
-        'start_eth': wei2eth(start_eth),
-        'start_reth': wei2eth(start_reth),
-        'end_eth': wei2eth(end_eth),
-        'end_reth': wei2eth(end_reth),
+        'start_eth': balances['total_eth'][start_ind],
+        'start_reth': balances['reth_supply'][start_ind],
+        'end_eth': balances['total_eth'][end_ind],
+        'end_reth': balances['reth_supply'][end_ind],
         'years': years,
     }
 
@@ -102,67 +111,37 @@ def measure_bid2reward(df):
 
 
 def fix_bloxroute_missing_bids(df):
-    ct = 0
-    ct_bloxroute_missing = 0
-    for ind, row in df.iterrows():  # TODO speed up by working on df instead of rows
-        missing_bid = np.isnan(row['max_bid']) and ~np.isnan(row['mev_reward'])
-        missing_winning_bid = (~np.isnan(row['max_bid']) and ~np.isnan(row['mev_reward'])
-                               and row['max_bid'] < row['mev_reward'])
-        if missing_bid or missing_winning_bid:
-            try:
-                assert row['mev_reward_relay'] in ('bloXroute Max Profit', 'bloXroute Regulated',
-                                                   'bloXroute Max Profit;bloXroute Regulated')
-                ct_bloxroute_missing += 1
-            except AssertionError:
-                if missing_bid:
-                    print('WARNING: missing bid other than bloxroute')
-                    print(row)
-                if missing_winning_bid:
-                    pct = 100 * row["max_bid"] / row["mev_reward"]
-                    if pct < 90:
-                        print(f'INFO: max_bid << mev_reward ({pct:.01f})')
-            ct += 1
-            df.loc[ind, 'max_bid'] = row['mev_reward'] / BID2REWARD
-    print(f'Filled in proxy max_bids for {ct} slots; {ct_bloxroute_missing} were missing'
-          f'bloxroute max_bids')
+    df = df.copy(deep=False)  # copy-on-write: only max_bid gets copied, when it's written
+    missing_bid, missing_winning_bid = needs_proxy_bid(df)
+    to_fix = missing_bid | missing_winning_bid
+    is_bloxroute = df['mev_reward_relay'].isin(
+        ['bloXroute Max Profit', 'bloXroute Regulated', 'bloXroute Max Profit;bloXroute Regulated'])
+
+    other_missing_bid = missing_bid & ~is_bloxroute
+    if other_missing_bid.any():
+        print(f'WARNING: {other_missing_bid.sum()} missing bids other than bloxroute; '
+              f'relays: {Counter(df.loc[other_missing_bid, "mev_reward_relay"])}')
+        print(df[other_missing_bid])
+    pct = 100 * df['max_bid'] / df['mev_reward']
+    low_pct = missing_winning_bid & ~is_bloxroute & (pct < 90)
+    if low_pct.any():
+        print(f'INFO: max_bid << mev_reward in {low_pct.sum()} non-bloxroute slots '
+              f'(min {pct[low_pct].min():.01f}%, median {pct[low_pct].median():.01f}%)')
+
+    df.loc[to_fix, 'max_bid'] = df.loc[to_fix, 'mev_reward'] / BID2REWARD
+    print(f'Filled in proxy max_bids for {to_fix.sum()} slots; '
+          f'{(to_fix & is_bloxroute).sum()} were missing bloxroute max_bids')
     return df
 
 
 def remove_bloxroute_ethical(df):
-    # API rate limit is 10 requests per minute -- this is super slow, but that's why we save it
+    # API rate limit is 10 requests per minute -- this is super slow, but that's why we journal it
     # we remove all vanilla-categorized blocks, not just bloxroute ethical; this is b/c when
     # multiple relays give the same block, only one is tagged by beaconcha.in. In other words,
     # we can't tell it _wasn't_ bloxroute ethical
-    pkl_path = Path('./data/remove_bloxroute_ethical.pkl')
-    pklpart_path = Path('./data/remove_bloxroute_ethical.pklpartial')
-    try:
-        with open(pkl_path, 'rb') as f:
-            d = pickle.load(f)
-    except FileNotFoundError:
-        d = {}  # slot to relay lut
-
+    d = load_journal()  # slot to relay lut
     slots = [s for s in df[df['is_vanilla'] & df['is_rocketpool']].index if s not in d.keys()]
-    errors = 0
-    for slot in tqdm(slots):
-        try:
-            r = requests.get(f'https://beaconcha.in/api/v1/slot/{slot}')
-            block = r.json()['data']['exec_block_number']
-            r = requests.get(f'https://beaconcha.in/api/v1/execution/block/{block}')
-            dat = r.json()['data'][0]
-            if dat['relay'] is None:
-                d[slot] = None
-            else:
-                d[slot] = dat
-        except:  # There are occasional errors (eg 504); run more than once to fill in gaps
-            errors += 1
-            time.sleep(30)
-            if errors > 10:
-                raise
-        with open(pklpart_path, 'wb') as f:
-            pickle.dump(d, f)
-        time.sleep(11)  # respect API rate limit
-    if pklpart_path.exists():
-        pklpart_path.replace(pkl_path)  # now that we've run; update full pkl
+    d.update(fetch_relays(slots))
 
     relay_d = {k: (v if v is None else v['relay']['tag']) for k, v in d.items()}
     todrop = sorted([k for k, v in relay_d.items() if v is not None])
@@ -173,28 +152,25 @@ def remove_bloxroute_ethical(df):
     print("  due to miscategorizing, the fee recipient info in the csvs should be ignored")
     print(f'beaconcha.in relay tags for RP vanilla slots: {Counter(relay_d.values())}')
 
-    with open('data/node2distributor.json', 'r') as f:
-        lut = json.load(f)
-    df_removed_wrong = df.loc[todrop].copy()
-    lost_eth = 0
-    incorrect_ls = []
-    for slot, row in df_removed_wrong.iterrows():
-        recipient = d[slot]['relay']['producerFeeRecipient'].lower()
-        if row['in_smoothing_pool']:
-            correct_recipient = (recipient == SMOOTHINGPOOLADDR.lower())
-        else:
-            correct_recipient = (recipient == lut[row['node_address']].lower())
-        if not correct_recipient:
-            lost_eth += row['reth_portion'] * d[slot]['blockMevReward'] / 1e18
-            incorrect_ls.append(row['node_address'])
+    # the csv's correct_fee_recipient can't be trusted here; check beaconcha.in's recipient instead
+    correct, disagreements = reverify_correct_fee_recipient(df, relay_recipients(d, todrop))
+    if len(disagreements):
+        print(f'INFO: beaconcha.in recipients disagree with correct_fee_recipient in '
+              f'{len(disagreements)} of these slots')
+    if correct.isna().any():
+        print(f'WARNING: {correct.isna().sum()} of these slots have a node missing from '
+              f'node2distributor.json (or no smoothing pool status); not counted below')
+    wrong = correct.index[(correct == False).fillna(False).to_numpy(dtype=bool)]
+    block_mev_reward = pd.Series([float(d[slot]['blockMevReward']) for slot in wrong], index=wrong)
+    lost_eth = (df.loc[wrong, 'reth_portion'] * block_mev_reward / 1e18).sum()
     print(f'Wrong fee recipient losses in these blocks about to be dropped: {lost_eth:.2f}ETH')
 
-    return df.drop(todrop), Counter(incorrect_ls)
+    return df.drop(todrop), Counter(df.loc[wrong, 'node_address'])
 
 
 def recipient_losses_mevboost(df, total_weeks, rethdict):
-    df_rp_mevboost = df[~df['is_vanilla'] & df['is_rocketpool']].copy()
-    wrong_df = df_rp_mevboost[df_rp_mevboost['correct_fee_recipient'] == False].copy()
+    df_rp_mevboost = df[~df['is_vanilla'] & df['is_rocketpool']]
+    wrong_df = df_rp_mevboost[df_rp_mevboost['correct_fee_recipient'] == False]
     num_wrong = len(wrong_df)
     num_right = len(df_rp_mevboost[df_rp_mevboost['correct_fee_recipient'] == True])
     num = len(df_rp_mevboost)
@@ -216,47 +192,46 @@ def recipient_losses_mevboost(df, total_weeks, rethdict):
     print(f' aka, a {100*(1-rethdict2apy(rethdict)/rethdict2apy(nolossd)):0.2f}% performance hit')
 
     issue_nodes = df_rp_mevboost[df_rp_mevboost['correct_fee_recipient'] == False]['node_address']
-    return Counter(issue_nodes)
-
-
-def vanilla_losses(df, total_weeks, rethdict):
-    df_temp = df.copy()
-    df_temp['proxy_max_bid'] = df_temp['max_bid'].rolling(7, center=True, min_periods=1).mean()
-    df_rp_vanilla = df_temp[df_temp['is_vanilla'] & df_temp['is_rocketpool']]
-
-    # make 3 empty columns
-    df_rp_vanilla.insert(0, 'lost_eth_bad_recipient', [np.nan] * len(df_rp_vanilla))
-    df_rp_vanilla.insert(0, 'lost_eth_nobid_avgestimate', [np.nan] * len(df_rp_vanilla))
-    df_rp_vanilla.insert(0, 'lost_eth_nobid_neighborestimate', [np.nan] * len(df_rp_vanilla))
-    df_rp_vanilla.insert(0, 'lost_eth_bid_estimate', [np.nan] * len(df_rp_vanilla))
-
-    known_vanilla = df_rp_vanilla[~df_rp_vanilla['max_bid'].isna()].copy()
-    df_rp_vanilla.loc[~df_rp_vanilla['max_bid'].isna(), 'lost_eth_bid_estimate'] = (
-        known_vanilla['max_bid'] * BID2REWARD -
-        known_vanilla['priority_fees']) * known_vanilla['reth_portion']
-
-    unknown_vanilla = df_rp_vanilla[df_rp_vanilla['max_bid'].isna()].copy()
-    df_rp_vanilla.loc[df_rp_vanilla['max_bid'].isna(), 'lost_eth_nobid_neighborestimate'] = (
-        unknown_vanilla['proxy_max_bid'] * BID2REWARD -
-        unknown_vanilla['priority_fees']) * unknown_vanilla['reth_portion']
-    df_rp_vanilla.loc[df_rp_vanilla['max_bid'].isna(), 'lost_eth_nobid_avgestimate'] = (
-        known_vanilla['max_bid'].mean() * BID2REWARD -
-        unknown_vanilla['priority_fees']) * unknown_vanilla['reth_portion']
-
+    return Counter(issue_nodes), wrong_df
+
+
+def vanilla_loss_columns(rp_vanilla, proxy_max_bid, bid2reward):
+    """per-slot loss estimates for RP vanilla slots, as the lost_eth_* columns of vanilla_losses
+
+    A slot with a max_bid gets lost_eth_bid_estimate; one without gets the two nobid estimates, from
+    proxy_max_bid and from the mean max_bid. Wrong fee recipient slots get only
+    lost_eth_bad_recipient instead
+    """
+    bid = rp_vanilla['max_bid']
+    prio_eth = rp_vanilla['priority_fees']
+    portion = rp_vanilla['reth_portion']
+    known = bid.notna()
+    losses = pd.DataFrame({
+        'lost_eth_bid_estimate': ((bid * bid2reward - prio_eth) * portion).where(known),
+        'lost_eth_nobid_neighborestimate':
+            ((proxy_max_bid * bid2reward - prio_eth) * portion).where(~known),
+        'lost_eth_nobid_avgestimate':
+            ((bid[known].mean() * bid2reward - prio_eth) * portion).where(~known),
+    })
     # for bad recipient, we don't get to subtract the prio fee component
-    for ind, row in df_rp_vanilla.iterrows():
-        if row['correct_fee_recipient']:
-            continue
-        worst_case = np.nanmax([
-            row['lost_eth_nobid_avgestimate'],
-            row['lost_eth_nobid_neighborestimate'],
-            row['lost_eth_bid_estimate'],
-        ]) + row['priority_fees'] * row['reth_portion']
-        # set this column and clear the others
-        df_rp_vanilla.at[ind, 'lost_eth_bad_recipient'] = worst_case
-        df_rp_vanilla.at[ind, 'lost_eth_bid_estimate'] = np.nan
-        df_rp_vanilla.at[ind, 'lost_eth_nobid_avgestimate'] = np.nan
-        df_rp_vanilla.at[ind, 'lost_eth_nobid_neighborestimate'] = np.nan
+    bad_rcpt = (rp_vanilla['correct_fee_recipient'] == False).fillna(False).to_numpy(dtype=bool)
+    estimate_cols = list(losses.columns)
+    losses['lost_eth_bad_recipient'] = (losses.max(axis=1) + prio_eth * portion).where(bad_rcpt)
+    # set this column and clear the others
+    losses.loc[bad_rcpt, estimate_cols] = np.nan
+    return losses
+
+
+def vanilla_losses(df, total_weeks, rethdict, neighbor_bid=None):
+    """neighbor_bid can supply a precomputed proxy_max_bid (eg, from incremental mode)"""
+    if neighbor_bid is None:
+        neighbor_bid = df['max_bid'].rolling(7, center=True, min_periods=1).mean()
+    df_temp = df.assign(proxy_max_bid=neighbor_bid)
+    df_rp_vanilla = df_temp[df_temp['is_vanilla'] & df_temp['is_rocketpool']]
+    df_rp_vanilla = pd.concat([
+        vanilla_loss_columns(df_rp_vanilla, df_rp_vanilla['proxy_max_bid'], BID2REWARD),
+        df_rp_vanilla
+    ], axis=1)
 
     df_rp_vanilla.to_csv('./results/vanilla_losses.csv')
     # note that lost_eth is a best guess on what an mev relay "should" have given us, but it's not
@@ -311,29 +286,176 @@ def vanilla_losses(df, total_weeks, rethdict):
     rcpt_nodes = df_rp_vanilla.loc[~df_rp_vanilla['correct_fee_recipient'].astype('boolean'
                                                                                   ), 'node_address']
     nonrcpt_nodes = df_rp_vanilla.loc[df_rp_vanilla['correct_fee_recipient'], 'node_address']
-    return Counter(rcpt_nodes), Counter(nonrcpt_nodes)
+    return Counter(rcpt_nodes), Counter(nonrcpt_nodes), df_rp_vanilla
+
+
+def loss_intervals(df, mevboost_loss_df, vanilla_loss_df, total_weeks, rethdict,
+                   n_resamples=N_RESAMPLES):
+    """bootstrap intervals for the 3a/4a totals (and vanilla wrong recipient), resampling slots"""
+    mevboost_slots = df[~df['is_vanilla'] & df['is_rocketpool']].index
+    samples = bootstrap_sums({
+        '3a': mevboost_loss_df['lost_eth'].reindex(mevboost_slots),
+        'vanilla_rcpt': vanilla_loss_df['lost_eth_bad_recipient'],
+        '4a': (vanilla_loss_df['lost_eth_bid_estimate'].fillna(0) +
+               vanilla_loss_df['lost_eth_nobid_neighborestimate'].fillna(0)),
+    }, n_resamples)
+
+    print(f'\n=== 95% bootstrap intervals ({n_resamples} resamples of the RP slots) ===')
+    for key, what in (('3a', 'ETH lost due to wrong fee recipient with MEV-boost'),
+                      ('vanilla_rcpt', 'ETH lost due to wrong fee recipient with vanilla'),
+                      ('4a', 'ETH lost due to not using relays (or theft)')):
+        low, high = interval(samples[key])
+        apys = []
+        for total in (low, high):
+            nolossd = rethdict.copy()
+            nolossd['end_eth'] += total
+            apys.append(rethdict2apy(nolossd))
+        print(f'{key}: {low:0.3f} to {high:0.3f} {what} '
+              f'({low/total_weeks:0.3f} to {high/total_weeks:0.3f} per week)')
+        print(f'  APY could have been {apys[0]:0.3f}% to {apys[1]:0.3f}%')
+
+
+def loss_timeseries(df, mevboost_loss_df, vanilla_loss_df, start_slot, end_slot, bucket='week',
+                    balances=None):
+    """ETH lost per category and the APY impact, per bucket of slots (see BUCKETS)
+
+    Every slot is mapped to its bucket number once and each category is summed with one bincount;
+    the APYs of all buckets come from one vectorized get_rethdict
+    """
+    origin, seconds = BUCKETS[bucket]
+    first = (slot2timestamp(start_slot) - origin) // seconds
+    n_buckets = (slot2timestamp(end_slot) - origin) // seconds - first + 1
+    codes = (slot2timestamp(df.index.to_numpy()) - origin) // seconds - first
+
+    losses = {
+        'lost_eth_mevboost_recipient': mevboost_loss_df['lost_eth'],
+        'lost_eth_vanilla_recipient': vanilla_loss_df['lost_eth_bad_recipient'],
+        'lost_eth_vanilla': (vanilla_loss_df['lost_eth_bid_estimate'].fillna(0) +
+                             vanilla_loss_df['lost_eth_nobid_neighborestimate'].fillna(0)),
+    }
+    bucket_starts = origin + (first + np.arange(n_buckets)) * seconds
+    table = pd.DataFrame({
+        'bucket_start': pd.to_datetime(bucket_starts, unit='s', utc=True),
+        'start_slot': np.maximum(timestamp2slot(bucket_starts), start_slot),
+        'end_slot': np.minimum(timestamp2slot(bucket_starts + seconds) - 1, end_slot),
+        'slots': np.bincount(codes, minlength=n_buckets),
+        'rp_slots': np.bincount(codes, weights=df['is_rocketpool'].to_numpy(dtype=float),
+                                minlength=n_buckets).astype(int),
+    })
+    for col, loss in losses.items():
+        weights = loss.reindex(df.index).fillna(0).to_numpy()
+        table[col] = np.bincount(codes, weights=weights, minlength=n_buckets)
+    table['lost_eth_total'] = table[list(losses)].sum(axis=1)
+
+    rethdict = get_rethdict(table['start_slot'].to_numpy(), table['end_slot'].to_numpy(), balances)
+    nolossd = dict(rethdict, end_eth=rethdict['end_eth'] + table['lost_eth_total'].to_numpy())
+    with np.errstate(divide='ignore', invalid='ignore'):  # single-slot buckets have years == 0
+        table['apy'] = rethdict2apy(rethdict)
+        table['apy_impact'] = rethdict2apy(nolossd) - table['apy']
+    table.to_csv(f'./results/losses_by_{bucket}.csv', index=False)
+
+    print(f'\n=== Losses by {bucket} (see results/losses_by_{bucket}.csv) ===')
+    worst = table.nlargest(3, 'lost_eth_total')
+    temp = [f'{row.bucket_start:%Y-%m-%d %H:%M} ({row.lost_eth_total:0.2f}ETH)'
+            for row in worst.itertuples()]
+    print(f'{n_buckets} {bucket} buckets; most lost in those starting {", ".join(temp)}')
+    return table
+
+
+def render_loss_timeseries(table, bucket):
+    """stacked ETH lost per bucket over the APY impact; saved as ./results/losses_by_<bucket>.png"""
+    fig = Figure(figsize=(10, 6))
+    ax_eth, ax_apy = fig.subplots(2, sharex=True)
+    x = table['bucket_start'].dt.tz_localize(None)
+    width = pd.Timedelta(seconds=BUCKETS[bucket][1] * 0.8)
+    bottom = np.zeros(len(table))
+    for col, label in (('lost_eth_mevboost_recipient', 'MEV-boost w/wrong recipient'),
+                       ('lost_eth_vanilla_recipient', 'Vanilla w/wrong recipient'),
+                       ('lost_eth_vanilla', 'Vanilla (estimated)')):
+        ax_eth.bar(x, table[col], width, bottom=bottom, label=label, align='edge')
+        bottom += table[col].to_numpy()
+    ax_eth.set_ylabel(f'ETH lost per {bucket}')
+    ax_eth.legend()
+    ax_eth.grid()
+    ax_apy.plot(x, table['apy_impact'], marker='.', drawstyle='steps-post')
+    ax_apy.set_ylabel('APY impact (%)')
+    ax_apy.grid()
+    fig.savefig(f'./results/losses_by_{bucket}.png', bbox_inches='tight')
+
+
+def toggle_analysis(df):
+    """nodes switching between vanilla and MEV-boost, or between right and wrong fee recipient"""
+    df_rp = df[df['is_rocketpool'] & df['node_address'].notna()]
+    summary, transitions = detect_toggles(df_rp)
+    summary.to_csv('./results/toggles.csv')
+    transitions.to_csv('./results/toggle_transitions.csv', index=False)
+
+    print('\n=== Toggling (see results/toggles.csv and results/toggle_transitions.csv) ===')
+    for col, what in (('vanilla_mev_toggles', 'between vanilla and MEV-boost'),
+                      ('recipient_toggles', 'between right and wrong fee recipient')):
+        togglers = summary[summary[col] > 0]
+        print(f'{len(togglers)} of {len(summary)} RP nodes switched {what} '
+              f'({togglers[col].sum()} switches in total)')
+        temp = [f'{addr} ({n})' for addr, n in togglers[col].nlargest(5).items()]
+        print(f'  Most switches: {", ".join(temp)}')
+    streak = summary['longest_wrong_recipient_streak']
+    print(f'Longest wrong fee recipient streak: {streak.max()} proposals '
+          f'({(streak > 1).sum()} nodes had more than one in a row)')
+
+    return Counter(summary['vanilla_mev_toggles'][summary['vanilla_mev_toggles'] > 0].to_dict())
+
+
+def get_sf(ls, grid=None):
+    """empirical survival function of ls, as (x, y) arrays
+
+    By default there's a point at every value; with grid (eg, np.geomspace over the bid range) the
+    SF is evaluated only at those x values, as the proportion of values >= x
+    """
+    ls = np.sort(np.asarray(ls, dtype=float))
+    n = len(ls)
+    if grid is not None:
+        grid = np.asarray(grid, dtype=float)
+        return grid, 1 - np.searchsorted(ls, grid, side='left') / max(n, 1)
+    x = np.concatenate([[0], ls])
+    y_sf = 1 - np.arange(n + 1) / max(n, 1)
+    return x, y_sf
 
 
-def get_sf(ls):
-    ls = sorted(ls)
-    x, y_sf = [0], [1]
+def decimate_sf(x, y_sf, max_points=MAX_PLOT_POINTS):
+    """at most ~max_points of an SF curve
 
-    for val in ls:
-        x.append(val)
-        y_sf.append(y_sf[-1] - 1 / len(ls))
+    Keeps the smallest bid and thins the bulk of the distribution while keeping every point of the
+    sparse high-bid tail, which is what the log plots are about
+    """
+    n = len(x) - 1
+    if n + 1 <= max_points:
+        return x, y_sf
+    # half evenly spaced by rank (the bulk), half geometric from the end (the tail)
+    even = np.linspace(0, n, max_points // 2).astype(int)
+    from_end = np.geomspace(1, n + 1, max_points // 2).astype(int)
+    ind = np.unique(np.concatenate([[0, 1], even, n + 1 - from_end]))
+    return x[ind], y_sf[ind]
 
-    return x, y_sf
 
+def distribution_plots(df, use_neighbor_max_bid=False, neighbor_bid=None, sf_grid=None):
+    """returns the Counter of unplotted RP slots by node and the figures to pass to render_figures
 
-def distribution_plots(df, use_neighbor_max_bid=False):
+    sf_grid optionally evaluates every SF on fixed bid values (see get_sf)
+    """
     print('')
+
+    def sf(bids):
+        return decimate_sf(*get_sf(bids, sf_grid))
+
     if use_neighbor_max_bid:
-        df['proxy_max_bid'] = df['max_bid'].rolling(7, center=True, min_periods=1).mean()
-        df['max_bid'].fillna(df['proxy_max_bid'], inplace=True)
+        if neighbor_bid is None:
+            neighbor_bid = df['max_bid'].rolling(7, center=True, min_periods=1).mean()
+        df = df.assign(proxy_max_bid=neighbor_bid)
+        df['max_bid'] = df['max_bid'].fillna(df['proxy_max_bid'])
         # use mean of all max bids if there were no nearby ones
         print(f'INFO: {sum(df["max_bid"].isna())} slots had no nearby max_bids;'
               f'filling with mean max_bid')
-        df['max_bid'].fillna(df['max_bid'].mean(), inplace=True)
+        df['max_bid'] = df['max_bid'].fillna(df['max_bid'].mean())
         lbl = 'take2_'
     else:
         # note - in these plots, we only assess when there's a max bid; a validator that never
@@ -352,156 +474,177 @@ def distribution_plots(df, use_neighbor_max_bid=False):
     df_nonrp = df[df['is_rocketpool'] == False]
     df_nonrp_vanilla = df_nonrp[df_nonrp['is_vanilla']]
 
-    all_x, all_sf = get_sf(df['max_bid'])
-    rp_x, rp_sf = get_sf(df_rp['max_bid'])
-    rp_mev_goodrcpt_x, rp_mev_goodrctp_sf = get_sf(df_rp_mev_goodrcpt['max_bid'])
-    rp_mev_badrcpt_x, rp_mev_badrcpt_sf = get_sf(df_rp_mev_badrcpt['max_bid'])
-    rp_vanilla_goodrcpt_x, rp_vanilla_goodrcpt_sf = get_sf(df_rp_vanilla_goodrcpt['max_bid'])
-    rp_vanilla_badrcpt_x, rp_vanilla_badrcpt_sf = get_sf(df_rp_vanilla_badrcpt['max_bid'])
-    nonrp_vanilla_x, nonrp_vanilla_sf = get_sf(df_nonrp_vanilla['max_bid'])
-
-    # 5a/5b Global vs RP -- ideally these look extremely similar
-    fig, ax = plt.subplots(1)
-    ax.semilogy(all_x, all_sf, marker='.', label='All')
-    ax.semilogy(rp_x, rp_sf, marker='.', label='RP')
-    ax.legend()
-    ax.grid()
-    ax.set_xlabel('Bid (ETH)')
-    ax.set_ylabel('SF (proportion of blocks with at least x axis bid)')
-    fig.savefig(f'./results/{lbl}global_vs_rp.png', bbox_inches='tight')
-    ax.set_xscale('log')
-    fig.savefig(f'./results/{lbl}global_vs_rp_loglog.png', bbox_inches='tight')
+    all_sf = sf(df['max_bid'])
+    rp_sf = sf(df_rp['max_bid'])
+    rp_mev_goodrcpt_sf = sf(df_rp_mev_goodrcpt['max_bid'])
+    rp_mev_badrcpt_sf = sf(df_rp_mev_badrcpt['max_bid'])
+    rp_vanilla_goodrcpt_sf = sf(df_rp_vanilla_goodrcpt['max_bid'])
+    rp_vanilla_badrcpt_sf = sf(df_rp_vanilla_badrcpt['max_bid'])
+    nonrp_vanilla_sf = sf(df_nonrp_vanilla['max_bid'])
+
+    # (file name, [(sf, label), ...]) for render_sf_figure
+    figures = [
+        # 5a/5b Global vs RP -- ideally these look extremely similar
+        (f'{lbl}global_vs_rp', [(all_sf, 'All'), (rp_sf, 'RP')]),
+        # 5c/5d/5e RP correct vs not
+        (f'{lbl}rp_mevgood_vs_mevbad', [
+            (rp_mev_goodrcpt_sf, 'RP - MEV boost'),
+            (rp_mev_badrcpt_sf, 'RP - MEV boost w/wrong recipient'),
+        ]),
+        (f'{lbl}rp_mevgood_vs_vanillagood', [
+            (rp_mev_goodrcpt_sf, 'RP - MEV boost'),
+            (rp_vanilla_goodrcpt_sf, 'RP - Vanilla'),
+        ]),
+        (f'{lbl}rp_mevgood_vs_vanillabad', [
+            (rp_mev_goodrcpt_sf, 'RP - MEV boost'),
+            (rp_vanilla_badrcpt_sf, 'RP - Vanilla w/wrong recipient'),
+        ]),
+        # yokem suggestion Vanilla Blocks - RP vs non
+        (f'{lbl}vanilla_rp_vs_nonrp', [
+            (nonrp_vanilla_sf, 'Vanilla - nonRP'),
+            (rp_vanilla_goodrcpt_sf, 'RP - Vanilla'),
+            (rp_vanilla_badrcpt_sf, 'RP - Vanilla w/wrong recipient'),
+        ]),
+    ]
 
-    # 5c/5d/5e RP correct vs not
-    fig, ax = plt.subplots(1)
-    ax.semilogy(rp_mev_goodrcpt_x, rp_mev_goodrctp_sf, marker='.', label='RP - MEV boost')
-    ax.semilogy(
-        rp_mev_badrcpt_x, rp_mev_badrcpt_sf, marker='.', label='RP - MEV boost w/wrong recipient')
-    ax.legend()
-    ax.grid()
-    ax.set_xlabel('Bid (ETH)')
-    ax.set_ylabel('SF (proportion of blocks with at least x axis bid)')
-    fig.savefig(f'./results/{lbl}rp_mevgood_vs_mevbad.png', bbox_inches='tight')
-    ax.set_xscale('log')
-    fig.savefig(f'./results/{lbl}rp_mevgood_vs_mevbad_loglog.png', bbox_inches='tight')
+    issue_nodes = unplotted_df['node_address']
+    return Counter(issue_nodes), figures
 
-    fig, ax = plt.subplots(1)
-    ax.semilogy(rp_mev_goodrcpt_x, rp_mev_goodrctp_sf, marker='.', label='RP - MEV boost')
-    ax.semilogy(rp_vanilla_goodrcpt_x, rp_vanilla_goodrcpt_sf, marker='.', label='RP - Vanilla')
-    ax.legend()
-    ax.grid()
-    ax.set_xlabel('Bid (ETH)')
-    ax.set_ylabel('SF (proportion of blocks with at least x axis bid)')
-    fig.savefig(f'./results/{lbl}rp_mevgood_vs_vanillagood.png', bbox_inches='tight')
-    ax.set_xscale('log')
-    fig.savefig(f'./results/{lbl}rp_mevgood_vs_vanillagood_loglog.png', bbox_inches='tight')
-
-    fig, ax = plt.subplots(1)
-    ax.semilogy(rp_mev_goodrcpt_x, rp_mev_goodrctp_sf, marker='.', label='RP - MEV boost')
-    ax.semilogy(
-        rp_vanilla_badrcpt_x,
-        rp_vanilla_badrcpt_sf,
-        marker='.',
-        label='RP - Vanilla w/wrong recipient')
-    ax.legend()
-    ax.grid()
-    ax.set_xlabel('Bid (ETH)')
-    ax.set_ylabel('SF (proportion of blocks with at least x axis bid)')
-    fig.savefig(f'./results/{lbl}rp_mevgood_vs_vanillabad.png', bbox_inches='tight')
-    ax.set_xscale('log')
-    fig.savefig(f'./results/{lbl}rp_mevgood_vs_vanillabad_loglog.png', bbox_inches='tight')
-
-    # yokem suggestion Vanilla Blocks - RP vs non
-    fig, ax = plt.subplots(1)
-    ax.semilogy(nonrp_vanilla_x, nonrp_vanilla_sf, marker='.', label='Vanilla - nonRP')
-    ax.semilogy(rp_vanilla_goodrcpt_x, rp_vanilla_goodrcpt_sf, marker='.', label='RP - Vanilla')
-    ax.semilogy(
-        rp_vanilla_badrcpt_x,
-        rp_vanilla_badrcpt_sf,
-        marker='.',
-        label='RP - Vanilla w/wrong recipient')
+
+def render_sf_figure(name, curves):
+    """draw one SF figure; saved as ./results/<name>.png and ./results/<name>_loglog.png
+
+    Uses a bare Figure (Agg canvas, no pyplot state), so it's safe to run in worker processes and
+    nothing is left open afterwards
+    """
+    fig = Figure()
+    ax = fig.subplots(1)
+    for (x, y_sf), label in curves:
+        ax.semilogy(x, y_sf, marker='.', label=label)
     ax.legend()
     ax.grid()
     ax.set_xlabel('Bid (ETH)')
     ax.set_ylabel('SF (proportion of blocks with at least x axis bid)')
-    fig.savefig(f'./results/{lbl}vanilla_rp_vs_nonrp.png', bbox_inches='tight')
+    fig.savefig(f'./results/{name}.png', bbox_inches='tight')
     ax.set_xscale('log')
-    fig.savefig(f'./results/{lbl}vanilla_rp_vs_nonrp_loglog.png', bbox_inches='tight')
-
-    issue_nodes = unplotted_df['node_address']
-    return Counter(issue_nodes)
-
-
-def main():
-    start_slot, end_slot = 0, 0
-
-    p = 'rockettheft_slot-0-to-0.csv'
-    df_ls = []
-    for p in sorted(Path(r'./data').glob('*.csv')):
-        print(p.name)
-        if start_slot == 0:
-            start_slot = int(p.name.split('-')[1])
-        df_ls.append(
-            pd.read_csv(
-                p,
-                converters={
-                    'max_bid': wei2eth,
-                    'mev_reward': wei2eth,
-                    'priority_fees': wei2eth,
-                    'avg_fee': wei2eth,
-                    'eth_collat_ratio': wei2eth,  # (node capital + user capital) / node capital
-                }))
-    df = pd.concat(df_ls)
-    end_slot = int(p.name.split('-')[3].split('.')[0])
-    assert end_slot != 0  # maybe hits if there's no data
-
-    # Slot 5203679 is when the grace period ended
-    penalty_start_slot = 5203679
-    df = df[df['slot'] >= penalty_start_slot]
-    start_slot = max(start_slot, penalty_start_slot)
-
-    df['is_vanilla'] = df['mev_reward'].isna()  # make a convenience column
-    try:
-        assert ((sum(df['avg_fee'] > 0.2) + sum(df['avg_fee'] < 0.05)) == 0)  # sanity check
-    except AssertionError:
-        over20 = df[df['avg_fee'] > 0.2]
-        if len(over20):
-            print('WARNING: over 20%')
-            print(over20)
-        under5 = df[df['avg_fee'] < 0.05]
-        if len(under5):
-            print('ERROR: under 5%; related to incomplete solo migrations;'
-                  'setting is_rocketpool to False')
-            print(under5)
-            df.loc[df['avg_fee'] < 0.05, 'is_rocketpool'] = False
-    df['reth_portion'] = (1 - (df['avg_fee'])) * (1 - (1 / df['eth_collat_ratio']))
-    df.set_index('slot', inplace=True)
+    fig.savefig(f'./results/{name}_loglog.png', bbox_inches='tight')
+
+
+def render_figures(figures, workers=None):
+    with ProcessPoolExecutor(workers, initializer=worker_init) as pool:
+        list(pool.map(render_sf_figure, *zip(*figures)))
+
+
+def headline_numbers(mevboost_loss_df, vanilla_loss_df, total_weeks, rethdict, bid2reward=None):
+    """the numbered results (3a-4c) printed by the loss stages, as a dict for the run report"""
+    numbers = {'bid2reward': BID2REWARD if bid2reward is None else bid2reward,
+               'apy': rethdict2apy(rethdict)}
+    vanilla_nonrcpt = (vanilla_loss_df['lost_eth_bid_estimate'].fillna(0) +
+                       vanilla_loss_df['lost_eth_nobid_neighborestimate'].fillna(0))
+    for (total, per_week, apy), lost_eth in (
+        (('3a_eth_lost', '3b_eth_lost_per_week', '3c_apy_without_losses'),
+         mevboost_loss_df['lost_eth'].sum()),
+        (('vanilla_recipient_eth_lost', 'vanilla_recipient_eth_lost_per_week',
+          'vanilla_recipient_apy_without_losses'), vanilla_loss_df['lost_eth_bad_recipient'].sum()),
+        (('4a_eth_lost', '4b_eth_lost_per_week', '4c_apy_without_losses'), vanilla_nonrcpt.sum()),
+    ):
+        nolossd = rethdict.copy()
+        nolossd['end_eth'] += lost_eth
+        numbers[total] = lost_eth
+        numbers[per_week] = lost_eth / total_weeks
+        numbers[apy] = rethdict2apy(nolossd)
+    return numbers
+
+
+def main(incremental=False, plots=True, from_slot=PENALTY_START_SLOT, to_slot=None,
+         bootstrap=True, bucket='week', report=None):
+    """analyse slots from_slot to to_slot (inclusive; None for everything available)
+
+    Only the csvs whose file names overlap that range are opened. Each stage is measured into
+    report (an instrument.RunReport; a default one if None), which is written at the end
+    """
+    if report is None:
+        report = RunReport()
+    report.run_info.update(incremental=incremental, from_slot=from_slot, to_slot=to_slot,
+                           bucket=bucket)
+    shards = select_shards(shard_index(), from_slot, to_slot)
+    assert shards  # no data in range
+    paths = [p for _first, _last, p in shards]
+    start_slot = max(shards[0][0], from_slot)
+    end_slot = shards[-1][1] if to_slot is None else min(shards[-1][1], to_slot)
+
+    with report.stage('ingest') as st:
+        if incremental:
+            if to_slot is not None:
+                raise ValueError('incremental mode always runs up to the latest data; no to_slot')
+            df, stats = update_incremental_state(paths, from_slot)
+            slots = stats['n_slots']
+        else:
+            # shards are loaded in parallel (cached in ./data/cache after the first run), and only
+            # the rows in range with a block are kept; slots still counts the missed ones
+            df, slots = load_slots(paths, (from_slot, to_slot), drop_missed=True)
+            df = prepare_slot_frame(df, from_slot)
+        st['rows_out'] = len(df)
 
     # Show total timeframe and get reth performance in that timeframe
-    slots = len(df)
     wks = (slots * 12) / (60 * 60 * 24 * 7)
     range_slots = end_slot - start_slot + 1
     range_wks = (range_slots * 12) / (60 * 60 * 24 * 7)
-    rethdict = get_rethdict(start_slot, end_slot)
+    with report.stage('get_rethdict'):
+        rethdict = get_rethdict(start_slot, end_slot)
+    report.run_info.update(start_slot=start_slot, end_slot=end_slot, slots=slots)
     print(f'Analyzing {wks:0.1f} weeks of data ({slots} slots)')
     print(f' {100*slots/range_slots:0.1f}% of range; {range_wks:0.1f} weeks ({range_slots} slots)')
     print('')
 
     # find and set BID2REWARD
     global BID2REWARD
-    df['temp'] = df['mev_reward'] / df['max_bid']
-    print(f"bid2reward: mean={df['temp'].mean():0.3f} median={df['temp'].median():0.3f}")
-    BID2REWARD = df['temp'].mean()
-    df.drop('temp', axis=1)
-
-    df = df[df['proposer_index'].notna()]  # get rid of slots without a block
-    df = fix_bloxroute_missing_bids(df.copy())
-    df, c_rcpt_removed = remove_bloxroute_ethical(df.copy())
-
-    c_rcpt_mev = recipient_losses_mevboost(df.copy(), wks, rethdict.copy())
-    c_rcpt_van, c_nonrcpt_van = vanilla_losses(df.copy(), wks, rethdict.copy())
-    c_unplotted = distribution_plots(df.copy())
-    distribution_plots(df.copy(), use_neighbor_max_bid=True)
+    if incremental:
+        BID2REWARD = stats['ratio_sum'] / stats['ratio_count']
+        print(f'bid2reward: mean={BID2REWARD:0.3f} (median not tracked in incremental mode)')
+    else:
+        df['temp'] = df['mev_reward'] / df['max_bid']
+        print(f"bid2reward: mean={df['temp'].mean():0.3f} median={df['temp'].median():0.3f}")
+        BID2REWARD = df['temp'].mean()
+        df.drop('temp', axis=1)
+
+    # stages get df itself; with copy-on-write, whatever a stage writes is copied at that point
+    with report.stage('fix_bloxroute_missing_bids', len(df)) as st:
+        df = fix_bloxroute_missing_bids(df)
+        st['rows_out'] = len(df)
+    with report.stage('remove_bloxroute_ethical', len(df)) as st:
+        df, c_rcpt_removed = remove_bloxroute_ethical(df)
+        st['rows_out'] = len(df)
+    neighbor_bid = None
+    if incremental:
+        neighbor_bid = proxy_max_bid(df, BID2REWARD)
+        df = df.drop(columns=['removed', *WINDOW_COLS])
+
+    with report.stage('recipient_losses_mevboost', len(df)) as st:
+        c_rcpt_mev, mevboost_loss_df = recipient_losses_mevboost(df, wks, rethdict.copy())
+        st['rows_out'] = len(mevboost_loss_df)
+    with report.stage('vanilla_losses', len(df)) as st:
+        c_rcpt_van, c_nonrcpt_van, vanilla_loss_df = vanilla_losses(df, wks, rethdict.copy(),
+                                                                    neighbor_bid)
+        st['rows_out'] = len(vanilla_loss_df)
+    report.headline = headline_numbers(mevboost_loss_df, vanilla_loss_df, wks, rethdict)
+    if bootstrap:
+        with report.stage('loss_intervals', len(df)):
+            loss_intervals(df, mevboost_loss_df, vanilla_loss_df, wks, rethdict.copy())
+    with report.stage('loss_timeseries', len(df)) as st:
+        losses_table = loss_timeseries(df, mevboost_loss_df, vanilla_loss_df, start_slot,
+                                       end_slot, bucket)
+        st['rows_out'] = len(losses_table)
+    with report.stage('toggle_analysis', len(df)):
+        c_toggles = toggle_analysis(df)
+    with report.stage('distribution_plots', len(df)):
+        c_unplotted, figures = distribution_plots(df)
+        _, take2_figures = distribution_plots(df, use_neighbor_max_bid=True,
+                                              neighbor_bid=neighbor_bid)
+    if plots:
+        with report.stage('render_figures'):
+            render_figures(figures + take2_figures)
+            render_loss_timeseries(losses_table, bucket)
 
     print('\n=== RP issue counts by node address ===')
     print(f'🚩Wrong recipient used with MEV-boost: {c_rcpt_mev}')
@@ -509,11 +652,62 @@ def main():
     print(f'🚩Wrong recipient used in removed blocks (we have no mev data, but beaconcha.in does):'
           f'{c_rcpt_removed}')
     print(f'⚠ Vanilla blocks (with correct recipient): {c_nonrcpt_van}')
+    print(f'⚠ Switched between vanilla and MEV-boost: {c_toggles}')
     print(f'⚠ No max bid: {c_unplotted}')  # not registered w/relays? hard to differentiate theft
 
+    # per-node lookups: python node_index.py <node address>
+    with report.stage('build_node_index', len(df)) as st:
+        st['rows_out'] = len(build_node_index(df, mevboost_loss_df, vanilla_loss_df))
+
+    print(f'\nRun report: {report.write()}')
+
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='reuse the prepared slot state in ./data/cache/incremental; only new csvs are read')
+    parser.add_argument(
+        '--no-plots',
+        dest='plots',
+        action='store_false',
+        help='skip rendering the results/*.png figures (the csvs and console output are unchanged)')
+    parser.add_argument('--no-bootstrap',
+                        dest='bootstrap',
+                        action='store_false',
+                        help='skip the bootstrap intervals for the loss totals')
+    parser.add_argument('--bucket',
+                        choices=BUCKETS,
+                        default='week',
+                        help='time bucket for results/losses_by_<bucket>.csv (default: week)')
+    parser.add_argument('--trace-memory',
+                        action='store_true',
+                        help='record tracemalloc peaks per stage in the run report (slower)')
+    parser.add_argument('--profile-dir', help='write a cProfile dump per stage into this directory')
+    parser.add_argument(
+        '--from-slot',
+        type=int,
+        help=f'first slot to analyse (default: {PENALTY_START_SLOT}, the end of the grace period)')
+    parser.add_argument('--to-slot', type=int, help='last slot to analyse (default: latest data)')
+    parser.add_argument('--from-date', help='YYYY-MM-DD (UTC); alternative to --from-slot')
+    parser.add_argument('--to-date', help='YYYY-MM-DD (UTC), inclusive; alternative to --to-slot')
+    args = parser.parse_args()
+    if args.from_slot is not None and args.from_date is not None:
+        parser.error('give at most one of --from-slot and --from-date')
+    if args.to_slot is not None and args.to_date is not None:
+        parser.error('give at most one of --to-slot and --to-date')
+    from_slot = PENALTY_START_SLOT if args.from_slot is None else args.from_slot
+    if args.from_date is not None:
+        from_slot = date2slot(args.from_date)
+    to_slot = args.to_slot
+    if args.to_date is not None:
+        to_slot = date2slot((date.fromisoformat(args.to_date) + timedelta(days=1)).isoformat()) - 1
+    if to_slot is not None and from_slot > to_slot:
+        parser.error(f'the range starts after it ends (slot {from_slot} > {to_slot})')
+    main(incremental=args.incremental, plots=args.plots, from_slot=from_slot, to_slot=to_slot,
+         bootstrap=args.bootstrap, bucket=args.bucket,
+         report=RunReport(args.trace_memory, args.profile_dir))
 
 # Notes:
 # - There was a bug based on using getMinipoolAt instead of getNodeMinipoolAt. There was also a bug
@@ -526,8 +720,5 @@ if __name__ == '__main__':
 
 # TODO check if theres's a period where nimbus bug caused issues that we should exclude
 #      that data; it might be May/June 2023
-# stretch todo -- for specific losses, plot over time
-# stretch todo -- identify NOs that toggle between vanilla and MEV?
-# stretch todo -- identify NOs that toggle between vanilla with right and wrong fee recipient
 # stretch todo -- suggested penalties per NO
 # stretch todo -- analyze data during MEV grace period
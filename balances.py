@@ -0,0 +1,117 @@
+"""Indexed access to the rETH balance history in ./data/balances.jsonl
+
+The jsonl file is converted once into sorted, memory-mapped .npy columns under
+./data/cache/balances/ (block, timestamp, total_eth, reth_supply). Lines appended to the jsonl
+since the last conversion are parsed and added on the next load; anything else (truncation, edits)
+causes a full rebuild. Lookups are binary searches on the timestamp column, so they accept whole
+arrays of times at once.
+"""
+import json
+from pathlib import Path
+import shutil
+
+import numpy as np
+
+from slot_data import CACHE_DIR
+
+BALANCES_PATH = Path('./data/balances.jsonl')
+BALANCES_CACHE_DIR = CACHE_DIR / 'balances'
+COLUMNS = ('block', 'timestamp', 'total_eth', 'reth_supply')
+
+
+def _parse_lines(lines):
+    cols = {col: [] for col in COLUMNS}
+    for line in lines:
+        block, totalETH, _stakingEth, rethSupply, time = json.loads(line)
+        cols['block'].append(int(block, 16))
+        cols['timestamp'].append(int(time, 16))
+        # int / float rounds the int to the nearest float first, matching the csvs' wei columns
+        # exactly (see slot_data.read_slot_csv)
+        cols['total_eth'].append(int(totalETH, 16) / 1e18)
+        cols['reth_supply'].append(int(rethSupply, 16) / 1e18)
+    return {
+        'block': np.array(cols['block'], dtype=np.int64),
+        'timestamp': np.array(cols['timestamp'], dtype=np.int64),
+        'total_eth': np.array(cols['total_eth'], dtype=np.float64),
+        'reth_supply': np.array(cols['reth_supply'], dtype=np.float64),
+    }
+
+
+def _read_meta():
+    try:
+        with open(BALANCES_CACHE_DIR / 'meta.json', 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _appended_bytes(path, meta):
+    """bytes added to path since the cache was written, or None if it can't just be appended to"""
+    if meta is None:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        if f.tell() < meta['offset']:
+            return None
+        tail = meta['last_line'].encode()
+        f.seek(meta['offset'] - len(tail))
+        if f.read(len(tail)) != tail:
+            return None
+        return f.read()
+
+
+def _write_cache(cols, offset, last_line):
+    tmp_path = BALANCES_CACHE_DIR.with_name(BALANCES_CACHE_DIR.name + '.tmp')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    for col in COLUMNS:
+        np.save(tmp_path / f'{col}.npy', cols[col])
+    with open(tmp_path / 'meta.json', 'w') as f:
+        json.dump({'offset': offset, 'last_line': last_line}, f)
+    shutil.rmtree(BALANCES_CACHE_DIR, ignore_errors=True)
+    tmp_path.replace(BALANCES_CACHE_DIR)
+
+
+def update_balances_cache(path=BALANCES_PATH):
+    """bring the .npy cache in line with the jsonl file, only parsing appended lines if possible"""
+    meta = _read_meta()
+    new_bytes = _appended_bytes(path, meta)
+    if new_bytes is None:
+        with open(path, 'rb') as f:
+            new_bytes = f.read()
+        offset = 0
+        old = {col: np.zeros(0, dtype=np.float64 if 'eth' in col else np.int64) for col in COLUMNS}
+    else:
+        offset = meta['offset']
+        old = {col: np.load(BALANCES_CACHE_DIR / f'{col}.npy') for col in COLUMNS}
+
+    # only consume complete lines; a line being written right now is picked up next time
+    complete = new_bytes[:new_bytes.rfind(b'\n') + 1]
+    lines = [line for line in complete.decode().splitlines() if line.strip()]
+    if not lines:
+        return
+    new = _parse_lines(lines)
+
+    cols = {col: np.concatenate([old[col], new[col]]) for col in COLUMNS}
+    if np.any(np.diff(cols['timestamp']) < 0):
+        order = np.argsort(cols['timestamp'], kind='stable')
+        cols = {col: arr[order] for col, arr in cols.items()}
+    _write_cache(cols, offset + len(complete), lines[-1] + '\n')
+
+
+def load_balances(path=BALANCES_PATH):
+    """dict of memory-mapped columns (sorted by timestamp), refreshing the cache first if needed"""
+    update_balances_cache(path)
+    return {col: np.load(BALANCES_CACHE_DIR / f'{col}.npy', mmap_mode='r') for col in COLUMNS}
+
+
+def nearest_index(balances, timestamps):
+    """index of the entry closest in time to each of timestamps; ties go to the earlier entry"""
+    times = balances['timestamp']
+    timestamps = np.asarray(timestamps)
+    after = np.clip(np.searchsorted(times, timestamps, side='right'), 1, len(times) - 1)
+    before = after - 1
+    use_after = np.abs(times[after] - timestamps) < np.abs(times[before] - timestamps)
+    ind = np.where(use_after, after, before)
+    # with repeated timestamps, take the first of them
+    return np.searchsorted(times, times[ind], side='left')
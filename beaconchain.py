@@ -0,0 +1,169 @@
+"""Fetching beaconcha.in relay info for slots, for remove_bloxroute_ethical
+
+Requests go through a token bucket sized to the API quota and a small thread pool, and only
+retryable failures (429/5xx, timeouts, dropped connections) are retried, with exponential backoff.
+Every slot fetched is appended to a jsonl journal as soon as it completes, so an interrupted run
+loses at most the record in flight and the next run carries on from the journal.
+"""
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+import json
+import os
+from pathlib import Path
+import pickle
+import threading
+import time
+
+import requests
+from tqdm import tqdm
+
+BASE_URL = 'https://beaconcha.in'
+# free tier quota; raise with an API key (BEACONCHAIN_APIKEY) that has a bigger plan
+REQUESTS_PER_MINUTE = 10
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# slots queued per worker thread; a short queue keeps submission from running ahead of the journal
+WINDOW_PER_WORKER = 2
+JOURNAL_PATH = Path('./data/remove_bloxroute_ethical.jsonl')
+LEGACY_PKL_PATH = Path('./data/remove_bloxroute_ethical.pkl')
+
+
+class TokenBucket:
+    """thread-safe limiter allowing `rate` acquisitions per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_local = threading.local()
+
+
+def _session():
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _get_json(url, bucket, api_key=None, max_retries=5, backoff=2.0):
+    params = {'apikey': api_key} if api_key else None
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            r = _session().get(url, params=params, timeout=30)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff * 2**attempt)
+            continue
+        if r.status_code in RETRYABLE_STATUSES and attempt < max_retries:
+            retry_after = r.headers.get('Retry-After', '')
+            time.sleep(float(retry_after) if retry_after.isdigit() else backoff * 2**attempt)
+            continue
+        r.raise_for_status()
+        return r.json()
+
+
+def fetch_slot_relay(slot, bucket, base_url=BASE_URL, api_key=None):
+    """beaconcha.in execution block info for slot, or None if it has no relay tag"""
+    r = _get_json(f'{base_url}/api/v1/slot/{slot}', bucket, api_key)
+    block = r['data']['exec_block_number']
+    r = _get_json(f'{base_url}/api/v1/execution/block/{block}', bucket, api_key)
+    dat = r['data'][0]
+    return None if dat['relay'] is None else dat
+
+
+def load_journal(journal_path=JOURNAL_PATH, legacy_pkl_path=LEGACY_PKL_PATH):
+    """slot -> relay info (or None) for every slot fetched so far
+
+    Includes the pickle written by older versions, if present; a truncated final journal line (from
+    a crash mid-write) is ignored and that slot simply gets fetched again.
+    """
+    d = {}
+    try:
+        with open(legacy_pkl_path, 'rb') as f:
+            d.update(pickle.load(f))
+    except FileNotFoundError:
+        pass
+    try:
+        with open(journal_path, 'r') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                d[rec['slot']] = rec['data']
+    except FileNotFoundError:
+        pass
+    return d
+
+
+def _terminate_partial_line(path):
+    """newline-terminate a final line cut off by a crash, so new records start on their own line"""
+    try:
+        with open(path, 'rb+') as f:
+            if f.seek(0, 2) and (f.seek(-1, 2), f.read(1))[1] != b'\n':
+                f.write(b'\n')
+    except FileNotFoundError:
+        pass
+
+
+def fetch_relays(slots, journal_path=JOURNAL_PATH, base_url=BASE_URL, workers=4,
+                 requests_per_minute=REQUESTS_PER_MINUTE, api_key=None):
+    """fetch relay info for slots concurrently, journaling each one; returns slot -> info
+
+    Slots that still fail after retries are left out (and out of the journal), so they're picked up
+    again on the next run
+    """
+    if api_key is None:
+        api_key = os.environ.get('BEACONCHAIN_APIKEY')
+    bucket = TokenBucket(requests_per_minute / 60)
+    d = {}
+    errors = Counter()
+    _terminate_partial_line(journal_path)
+    slots = list(slots)
+    todo = iter(slots)
+    pending = {}  # future -> slot; at most WINDOW_PER_WORKER * workers queued at a time
+    # the pool is closed before the journal, and on an exception or Ctrl-C whatever is still queued
+    # is cancelled, so only the requests in flight are waited for (and lost)
+    with open(journal_path, 'a') as f, ThreadPoolExecutor(workers) as pool, \
+            tqdm(total=len(slots)) as progress:
+        try:
+            while True:
+                for slot in islice(todo, WINDOW_PER_WORKER * workers - len(pending)):
+                    pending[pool.submit(fetch_slot_relay, slot, bucket, base_url, api_key)] = slot
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    slot = pending.pop(fut)
+                    progress.update()
+                    try:
+                        d[slot] = fut.result()
+                    except Exception as e:  # eg, 404 or exhausted retries; left for the next run
+                        errors[type(e).__name__] += 1
+                        continue
+                    f.write(json.dumps({'slot': int(slot), 'data': d[slot]}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    if errors:
+        print(f'WARNING: {sum(errors.values())} slots failed to fetch ({dict(errors)}); '
+              f'rerun to fill in the gaps')
+    return d
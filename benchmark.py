@@ -0,0 +1,180 @@
+"""Time and memory-profile analysis.py's stages on synthetic data of increasing size
+
+For each size, synthetic.py data is generated once under ./bench/<slots>/data (and reused after
+that), then the stages of analysis.main are run on it in order, each timed and, unless --no-memory,
+traced for peak python/numpy allocations with tracemalloc (which slows the pandas-heavy stages
+somewhat, so only compare runs made the same way). tracemalloc only sees this process; for a stage
+that runs worker processes (the csv ingest), the largest worker's peak RSS is recorded as well, when
+the stage raised it. Stage output is swallowed.
+
+Results are compared to a stored baseline (--save-baseline writes one); a stage that got more than
+--tolerance slower or hungrier, beyond a small noise floor, is reported as a regression and the
+exit status is 1.
+
+Usage: python benchmark.py [--sizes 10000,100000,1000000] [--save-baseline]
+"""
+import argparse
+from contextlib import contextmanager, redirect_stdout
+import io
+import json
+import os
+from pathlib import Path
+import shutil
+import sys
+import time
+import tracemalloc
+
+import analysis
+from instrument import peak_rss_mb
+from slot_data import load_slots, prepare_slot_frame, select_shards, shard_index
+from synthetic import generate
+
+SIZES = (10_000, 100_000, 1_000_000)
+BENCH_DIR = Path('./bench')
+BASELINE_PATH = Path('./benchmark_baseline.json')
+TOLERANCE = 0.25
+# differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_MB = 1.0
+
+
+@contextmanager
+def _measure(results, stage, memory):
+    if memory:
+        tracemalloc.start()
+        workers_before = peak_rss_mb(children=True)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        results[stage] = {'seconds': time.perf_counter() - start}
+        if memory:
+            results[stage]['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            # a high-water mark over all finished workers, so it only says something when it rose
+            workers = peak_rss_mb(children=True)
+            if workers is not None and workers > workers_before:
+                results[stage]['worker_rss_mb'] = workers
+
+
+def _load(from_slot):
+    """the ingest stage, as analysis.main does it"""
+    paths = [p for _first, _last, p in select_shards(shard_index(), from_slot, None)]
+    df, slots = load_slots(paths, (from_slot, None), drop_missed=True)
+    return prepare_slot_frame(df, from_slot), slots
+
+
+def run_stages(n_slots, memory=True, plots=True):
+    """{stage: {'seconds': ..., 'peak_mb': ...}} for one pass of the pipeline over n_slots slots"""
+    work_dir = BENCH_DIR / str(n_slots)
+    if not (work_dir / 'data').exists():
+        print(f'generating {n_slots} slots of synthetic data in {work_dir}')
+        generate(work_dir / 'data', n_slots)
+    (work_dir / 'results').mkdir(exist_ok=True)
+
+    results = {}
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with redirect_stdout(io.StringIO()):
+            from_slot = analysis.PENALTY_START_SLOT
+            shutil.rmtree('data/cache', ignore_errors=True)
+            with _measure(results, 'ingest (csv)', memory):
+                df, slots = _load(from_slot)
+            with _measure(results, 'ingest (cached)', memory):
+                df, slots = _load(from_slot)
+            start_slot, end_slot = int(df.index[0]), int(df.index[-1])
+            wks = (slots * 12) / (60 * 60 * 24 * 7)
+            with _measure(results, 'get_rethdict', memory):
+                rethdict = analysis.get_rethdict(start_slot, end_slot)
+            analysis.BID2REWARD = (df['mev_reward'] / df['max_bid']).mean()
+
+            with _measure(results, 'fix_bloxroute_missing_bids', memory):
+                df = analysis.fix_bloxroute_missing_bids(df)
+            with _measure(results, 'remove_bloxroute_ethical', memory):
+                df, _ = analysis.remove_bloxroute_ethical(df)
+            with _measure(results, 'recipient_losses_mevboost', memory):
+                _, mevboost_loss_df = analysis.recipient_losses_mevboost(df, wks, rethdict.copy())
+            with _measure(results, 'vanilla_losses', memory):
+                _, _, vanilla_loss_df = analysis.vanilla_losses(df, wks, rethdict.copy())
+            with _measure(results, 'loss_intervals', memory):
+                analysis.loss_intervals(df, mevboost_loss_df, vanilla_loss_df, wks, rethdict.copy())
+            with _measure(results, 'loss_timeseries', memory):
+                losses_table = analysis.loss_timeseries(df, mevboost_loss_df, vanilla_loss_df,
+                                                        start_slot, end_slot)
+            with _measure(results, 'toggle_analysis', memory):
+                analysis.toggle_analysis(df)
+            with _measure(results, 'distribution_plots', memory):
+                _, figures = analysis.distribution_plots(df)
+                _, take2_figures = analysis.distribution_plots(df, use_neighbor_max_bid=True)
+            if plots:
+                with _measure(results, 'render_figures', memory):
+                    analysis.render_figures(figures + take2_figures)
+                    analysis.render_loss_timeseries(losses_table, 'week')
+            with _measure(results, 'build_node_index', memory):
+                analysis.build_node_index(df, mevboost_loss_df, vanilla_loss_df)
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """print results next to baseline; returns the list of regressions"""
+    regressions = []
+    for size, stages in results.items():
+        print(f'\n=== {int(size):,} slots ===')
+        print(f'{"stage":<28} {"seconds":>9} {"baseline":>9} {"peak MB":>9} {"baseline":>9} '
+              f'{"worker MB":>9} {"baseline":>9}')
+        for stage, cur in stages.items():
+            base = baseline.get(size, {}).get(stage, {})
+            flags = []
+            for key, floor in (('seconds', MIN_SECONDS), ('peak_mb', MIN_MB),
+                               ('worker_rss_mb', MIN_MB)):
+                if key in cur and key in base and (cur[key] > base[key] * (1 + tolerance) and
+                                                   cur[key] - base[key] > floor):
+                    flags.append(key)
+                    regressions.append((size, stage, key, base[key], cur[key]))
+
+            def fmt(d, key):
+                return f'{d[key]:9.3f}' if key in d else f'{"-":>9}'
+
+            print(f'{stage:<28} {fmt(cur, "seconds")} {fmt(base, "seconds")} '
+                  f'{fmt(cur, "peak_mb")} {fmt(base, "peak_mb")} '
+                  f'{fmt(cur, "worker_rss_mb")} {fmt(base, "worker_rss_mb")}'
+                  f'{"  REGRESSION: " + ", ".join(flags) if flags else ""}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default=','.join(str(n) for n in SIZES),
+                        help='comma-separated slot counts (eg, add 10000000 for the big run)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed fractional slowdown/growth before flagging a regression')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='time only, without tracemalloc overhead')
+    parser.add_argument('--no-plots', dest='plots', action='store_false',
+                        help='skip the render_figures stage')
+    args = parser.parse_args()
+
+    results = {}
+    for n_slots in (int(s) for s in args.sizes.split(',')):
+        results[str(n_slots)] = run_stages(n_slots, args.memory, args.plots)
+
+    try:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=1)
+        print(f'\nsaved baseline to {args.baseline}')
+    elif regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {100*args.tolerance:.0f}%')
+        sys.exit(1)
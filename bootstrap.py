@@ -0,0 +1,50 @@
+"""Bootstrap intervals for loss totals, resampling slots with replacement
+
+Each resample is a row of a random index matrix into the per-slot losses, so a batch of resamples
+is one fancy-index and one sum. Batches are sized to keep the index matrix under CHUNK_BYTES and
+are spread over a process pool; every batch gets its own child of one SeedSequence, so results
+don't depend on the number of workers.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrument import worker_init
+
+N_RESAMPLES = 2000
+CHUNK_BYTES = 64 * 2**20  # per batch index matrix
+
+
+def _resampled_sums(values, n_resamples, seed):
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(values), size=(n_resamples, len(values)))
+    return values[idx].sum(axis=1)
+
+
+def bootstrap_sums(named_values, n_resamples=N_RESAMPLES, seed=0, workers=None):
+    """{name: array of n_resamples bootstrapped totals} for each {name: per-slot values}
+
+    NaN values count as 0 (eg, slots without a loss estimate of that kind)
+    """
+    jobs = []
+    for name, values in named_values.items():
+        values = np.nan_to_num(np.asarray(values, dtype=float))
+        if len(values) == 0:
+            values = np.zeros(1)  # nothing to lose; every total is 0
+        batch = max(1, CHUNK_BYTES // (8 * len(values)))
+        jobs += [(name, values, min(batch, n_resamples - start))
+                 for start in range(0, n_resamples, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+
+    sums = {name: [] for name in named_values}
+    with ProcessPoolExecutor(workers, initializer=worker_init) as pool:
+        futures = [pool.submit(_resampled_sums, values, n, job_seed)
+                   for (_name, values, n), job_seed in zip(jobs, seeds)]
+        for (name, _values, _n), fut in zip(jobs, futures):
+            sums[name].append(fut.result())
+    return {name: np.concatenate(ls) for name, ls in sums.items()}
+
+
+def interval(samples, ci=0.95):
+    """(low, high) percentile interval of bootstrapped samples"""
+    return tuple(np.quantile(samples, [(1 - ci) / 2, (1 + ci) / 2]))
@@ -1,10 +1,50 @@
+"""Build ./data/node2distributor.json, mapping each Rocket Pool node to its fee distributor
+
+Node addresses are paged out of RocketNodeManager and the distributor (proxy) addresses are looked
+up through Multicall3's aggregate3, CHUNK_SIZE nodes per eth_call, with several chunks in flight at
+once. Nodes are only ever appended to the node list, so an existing json is extended with the nodes
+past the ones it already has rather than rebuilt. All calls are pinned to one block.
+
+The RPC endpoint is ETH_RPC_URL if set (eg, a local dev chain or mock), otherwise Infura mainnet
+with the INFURA api key.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
+from pathlib import Path
 
 from web3 import HTTPProvider, Web3
 
-API_KEY = os.environ['INFURA']
-CLIENT = Web3(HTTPProvider(f"https://mainnet.infura.io/v3/{API_KEY}"))
+RPC_URL = os.environ.get('ETH_RPC_URL') or f"https://mainnet.infura.io/v3/{os.environ['INFURA']}"
+CLIENT = Web3(HTTPProvider(RPC_URL))
+LUT_PATH = Path('./data/node2distributor.json')
+CHUNK_SIZE = 100  # nodes per getNodeAddresses page and per aggregate3 call
+WORKERS = 4
+
+# same address on mainnet and most other chains; see https://www.multicall3.com
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+MULTICALL3_ABI = json.dumps([{
+    'inputs': [{
+        'components': [
+            {'internalType': 'address', 'name': 'target', 'type': 'address'},
+            {'internalType': 'bool', 'name': 'allowFailure', 'type': 'bool'},
+            {'internalType': 'bytes', 'name': 'callData', 'type': 'bytes'},
+        ],
+        'internalType': 'struct Multicall3.Call3[]', 'name': 'calls', 'type': 'tuple[]'
+    }],
+    'name': 'aggregate3',
+    'outputs': [{
+        'components': [
+            {'internalType': 'bool', 'name': 'success', 'type': 'bool'},
+            {'internalType': 'bytes', 'name': 'returnData', 'type': 'bytes'},
+        ],
+        'internalType': 'struct Multicall3.Result[]', 'name': 'returnData', 'type': 'tuple[]'
+    }],
+    'stateMutability': 'payable',
+    'type': 'function'
+}])
+GET_PROXY_ADDRESS_SELECTOR = Web3.keccak(text='getProxyAddress(address)')[:4]
 
 RocketNodeManager = CLIENT.eth.contract(
     address=Web3.to_checksum_address("0x89F478E6Cc24f052103628f36598D4C14Da3D287"),
@@ -18,15 +58,67 @@ RocketNodeDistributorFactory = CLIENT.eth.contract(
     '[{"inputs":[{"internalType":"contract RocketStorageInterface","name":"_rocketStorageAddress","type":"address"}],"stateMutability":"nonpayable","type":"constructor"},{"anonymous":false,"inputs":[{"indexed":false,"internalType":"address","name":"_address","type":"address"}],"name":"ProxyCreated","type":"event"},{"inputs":[{"internalType":"address","name":"_nodeAddress","type":"address"}],"name":"createProxy","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_nodeAddress","type":"address"}],"name":"getProxyAddress","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"getProxyBytecode","outputs":[{"internalType":"bytes","name":"","type":"bytes"}],"stateMutability":"pure","type":"function"},{"inputs":[],"name":"version","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"stateMutability":"view","type":"function"}]'
 )
 
-if __name__ == '__main__':
-    num_nodes = RocketNodeManager.functions.getNodeCount().call()
-    d = {}
+Multicall3 = CLIENT.eth.contract(address=Web3.to_checksum_address(MULTICALL3_ADDRESS),
+                                 abi=MULTICALL3_ABI)
+
+
+def get_proxy_addresses(node_ls, block):
+    """distributor address for each of node_ls, in one aggregate3 eth_call"""
+    target = RocketNodeDistributorFactory.address
+    calls = [(target, False, GET_PROXY_ADDRESS_SELECTOR + CLIENT.codec.encode(['address'], [addr]))
+             for addr in node_ls]
+    results = Multicall3.functions.aggregate3(calls).call(block_identifier=block)
+    return [CLIENT.codec.decode(['address'], data)[0] for _success, data in results]
+
+
+def fetch_chunk(offset, limit, block):
+    node_ls = RocketNodeManager.functions.getNodeAddresses(offset, limit).call(
+        block_identifier=block)
+    return dict(zip(node_ls, get_proxy_addresses(node_ls, block)))
 
-    for offset in range(0, num_nodes, 100):
-        print(offset)
-        node_ls = RocketNodeManager.functions.getNodeAddresses(offset, 100).call()
-        for addr in node_ls:
-            d[addr] = RocketNodeDistributorFactory.functions.getProxyAddress(addr).call()
 
-    with open('data/node2distributor.json', 'w') as f:
+def load_lut(path=LUT_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def update_lut(path=LUT_PATH, chunk_size=CHUNK_SIZE, workers=WORKERS, full=False):
+    """add the nodes registered since path was last written; full=True refetches everything"""
+    block = CLIENT.eth.block_number
+    num_nodes = RocketNodeManager.functions.getNodeCount().call(block_identifier=block)
+    d = {} if full else load_lut(path)
+    # the stored nodes should be exactly the first len(d) in the node list; if not, start over
+    if d and (len(d) > num_nodes or RocketNodeManager.functions.getNodeAt(len(d) - 1).call(
+            block_identifier=block) not in d):
+        print(f'{path} does not match the node list; refetching all nodes')
+        d = {}
+    start = len(d)
+    print(f'{num_nodes} nodes at block {block}; fetching {num_nodes - start} new')
+
+    offsets = range(start, num_nodes, chunk_size)
+    with ThreadPoolExecutor(workers) as pool:
+        for offset, chunk in zip(
+                offsets,
+                pool.map(lambda o: fetch_chunk(o, min(chunk_size, num_nodes - o), block), offsets)):
+            print(offset)
+            d.update(chunk)
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
         json.dump(d, f, indent=4, sort_keys=True)
+    tmp_path.replace(path)
+    return d
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='nodes per aggregate3 call')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='chunks fetched concurrently')
+    parser.add_argument('--full', action='store_true',
+                        help='ignore the existing json and fetch every node')
+    args = parser.parse_args()
+    update_lut(chunk_size=args.chunk_size, workers=args.workers, full=args.full)
@@ -0,0 +1,133 @@
+"""Incremental preparation of the slot frame for analysis.py --incremental
+
+The prepared per-slot frame (after prepare_slot_frame and dropping missed slots) is kept under
+./data/cache/incremental/ together with the shards it was built from and some running sums. When
+new csvs are added after the last processed one, only those are loaded and prepared; everything
+else comes back memory-mapped.
+
+Things that depend on global quantities are stored in a form that doesn't:
+- BID2REWARD (mean of mev_reward / max_bid) is kept as a running sum and count
+- proxy_max_bid (centred rolling mean of max_bid, after bloxroute fixups and bloxroute ethical
+  removal) is kept as per-slot window sums of the raw max_bids and of the mev_rewards that get
+  divided by BID2REWARD, plus a window count; only new slots and the WINDOW // 2 slots before them
+  need their windows recomputed
+
+Anything else (a processed csv changing, a slot's beaconcha.in relay info being filled in later, a
+different penalty start slot) triggers a full rebuild.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from beaconchain import fetch_relays, load_journal
+from slot_data import (CACHE_DIR, _source_key, concat_slot_frames, load_frame, load_slots,
+                       needs_proxy_bid, prepare_slot_frame, save_frame)
+
+STATE_DIR = CACHE_DIR / 'incremental'
+WINDOW = 7  # proxy_max_bid rolling window (centred)
+WINDOW_COLS = ('window_bid_sum', 'window_reward_sum', 'window_count')
+
+
+def _load_state():
+    try:
+        with open(STATE_DIR / 'meta.json', 'r') as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    return load_frame(STATE_DIR).set_index('slot'), meta
+
+
+def _removed_slots(df, d):
+    """slots beaconcha.in tags with a relay; remove_bloxroute_ethical drops these"""
+    tagged = [k for k, v in d.items() if v is not None]
+    return df.index.isin(tagged)
+
+
+def window_sums(seg, window=WINDOW):
+    """the WINDOW_COLS for the rows of seg (consecutive, after bloxroute ethical removal)
+
+    proxy_max_bid turns these into the centred rolling mean of max_bid after bloxroute fixups, for
+    any bid2reward
+    """
+    missing_bid, missing_winning_bid = needs_proxy_bid(seg)
+    to_fix = missing_bid | missing_winning_bid
+    bids = seg['max_bid'].where(~to_fix)
+    rewards = seg['mev_reward'].where(to_fix)
+
+    def rolling_sum(ser):
+        return ser.rolling(window, center=True, min_periods=1).sum().fillna(0)
+
+    return pd.DataFrame({
+        'window_bid_sum': rolling_sum(bids),
+        'window_reward_sum': rolling_sum(rewards),
+        'window_count': rolling_sum((bids.notna() | rewards.notna()).astype(float)),
+    })
+
+
+def _window_sums(df, first_new):
+    """recompute the window columns for rows at positions >= first_new (of the non-removed rows)"""
+    kept = np.flatnonzero(~df['removed'].to_numpy())
+    start = max(0, first_new - WINDOW // 2)
+    window = window_sums(df.iloc[kept[max(0, start - WINDOW // 2):]])
+    rows = kept[start:]
+    for col in WINDOW_COLS:
+        df.iloc[rows, df.columns.get_loc(col)] = window[col].to_numpy()[-len(rows):]
+    return df
+
+
+def update_incremental_state(paths, penalty_start_slot):
+    """bring the stored slot frame up to date with paths; returns (frame, stats)
+
+    stats has n_slots (slots analysed, including missed ones), ratio_sum and ratio_count
+    """
+    keys = [_source_key(p) for p in paths]
+    df, meta = _load_state()
+    d = load_journal()
+
+    rebuild = (
+        meta is None or meta['penalty_start_slot'] != penalty_start_slot or
+        meta['shards'] != keys[:len(meta['shards'])] or
+        not np.array_equal(_removed_slots(df, d), df['removed'].to_numpy()))
+    if rebuild:
+        print('Incremental: (re)building slot state from all csvs')
+        df = None
+        stats = {'n_slots': 0, 'ratio_sum': 0.0, 'ratio_count': 0}
+        new_paths = paths
+    else:
+        stats = meta['stats']
+        new_paths = paths[len(meta['shards']):]
+        print(f'Incremental: {len(new_paths)} new csv(s) to process')
+
+    if new_paths:
+        new, n_slots = load_slots(new_paths, (penalty_start_slot, None), drop_missed=True)
+        new = prepare_slot_frame(new, penalty_start_slot)
+        if df is not None and len(new) and new.index.min() <= df.index.max():
+            raise ValueError('new csvs overlap already-processed slots; delete '
+                             f'{STATE_DIR} to rebuild')
+        ratio = new['mev_reward'] / new['max_bid']
+        stats = {
+            'n_slots': stats['n_slots'] + n_slots,
+            'ratio_sum': stats['ratio_sum'] + float(ratio.sum()),
+            'ratio_count': stats['ratio_count'] + int(ratio.notna().sum()),
+        }
+
+        to_fetch = [s for s in new[new['is_vanilla'] & new['is_rocketpool']].index if s not in d]
+        d.update(fetch_relays(to_fetch))
+        new['removed'] = _removed_slots(new, d)
+        for col in WINDOW_COLS:
+            new[col] = np.nan
+
+        first_new = 0 if df is None else int((~df['removed']).sum())
+        df = new if df is None else concat_slot_frames([df.reset_index(), new.reset_index()
+                                                        ]).set_index('slot')
+        df = _window_sums(df, first_new)
+        save_frame(df.reset_index(), STATE_DIR, penalty_start_slot=penalty_start_slot,
+                   shards=keys, stats=stats)
+    return df, stats
+
+
+def proxy_max_bid(df, bid2reward):
+    """proxy_max_bid for the non-removed rows of df, from the stored window sums"""
+    return ((df['window_bid_sum'] + df['window_reward_sum'] / bid2reward) /
+            df['window_count'].replace(0, np.nan))
@@ -0,0 +1,124 @@
+"""Per-stage timing and memory accounting for analysis.main, written out as a json run report
+
+Each stage is wrapped in RunReport.stage(), which records wall and CPU time, the process's peak
+RSS when the stage ended (and how much the stage raised it), and the rows going in and out. That
+RSS is this process's only; a stage that runs a process pool also records the largest finished
+worker's peak RSS, when it raised it. Two heavier measurements are opt-in: tracemalloc peak
+allocations per stage (trace_memory=True) and a cProfile dump per stage into profile_dir, for
+snakeviz/pstats. Non-finite numbers (eg a mean of nothing) are written as null.
+
+Reports go to ./reports/run-<UTC time>.json, next to ./results, so runs can be lined up against
+each other over time.
+"""
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime, timezone
+import json
+import math
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not on Windows; peak RSS is left out there
+    resource = None
+
+REPORTS_DIR = Path('./reports')
+
+
+def peak_rss_mb(children=False):
+    """peak RSS of this process, or with children=True of the largest child process waited for so
+    far (eg a finished ProcessPoolExecutor worker); None where there's no resource module"""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def _jsonable(value):
+    """plain python for json, through dicts and lists; NaN and inf (eg a mean of nothing) -> None"""
+    if isinstance(value, dict):
+        return {key: _jsonable(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def worker_init():
+    """ProcessPoolExecutor initializer; forked workers would inherit tracing and profiling"""
+    tracemalloc.stop()
+    sys.setprofile(None)
+
+
+class RunReport:
+    """collects stage measurements and headline numbers for one run"""
+
+    def __init__(self, trace_memory=False, profile_dir=None, **run_info):
+        self.trace_memory = trace_memory
+        self.profile_dir = None if profile_dir is None else Path(profile_dir)
+        self.started = datetime.now(timezone.utc)
+        self.run_info = run_info
+        self.stages = {}
+        self.headline = {}
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """measure the enclosed block; set rows_out on the yielded dict if it makes sense"""
+        record = {'rows_in': rows_in, 'rows_out': None}
+        rss_before = peak_rss_mb()
+        workers_before = peak_rss_mb(children=True)
+        if self.trace_memory:
+            tracemalloc.start()
+        profiler = None
+        if self.profile_dir is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            if profiler is not None:
+                profiler.disable()
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(self.profile_dir / f'{name}.prof')
+            if self.trace_memory:
+                record['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            record['peak_rss_mb'] = peak_rss_mb()
+            if rss_before is not None:
+                record['peak_rss_increase_mb'] = record['peak_rss_mb'] - rss_before
+            # a high-water mark over all finished workers, so only recorded when the stage raised it
+            workers = peak_rss_mb(children=True)
+            if workers is not None and workers > workers_before:
+                record['worker_peak_rss_mb'] = workers
+            self.stages[name] = record
+
+    def write(self, reports_dir=REPORTS_DIR):
+        """write the report as json; returns its path"""
+        reports_dir = Path(reports_dir)
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        path = reports_dir / f'run-{self.started:%Y%m%dT%H%M%SZ}.json'
+        report = {
+            'started': self.started.isoformat(),
+            'total_wall_s': sum(s['wall_s'] for s in self.stages.values()),
+            'peak_rss_mb': peak_rss_mb(),
+            'worker_peak_rss_mb': peak_rss_mb(children=True),
+            **self.run_info,
+            'headline': self.headline,
+            'stages': self.stages,
+        }
+        with open(path, 'w') as f:
+            json.dump(_jsonable(report), f, indent=1, allow_nan=False)
+        return path
@@ -0,0 +1,127 @@
+"""Per-node-operator index of RP proposals, for answering "what has node X done"
+
+analysis.py writes it at the end of each run under ./data/node_index/:
+- slots/ has every analysed RP proposal, sorted by node_address then slot, with its estimated loss
+- nodes/ has one row per node (sorted by node_address) with its counts, losses, vanilla/MEV ratio,
+  first/last offence slot and the [start, stop) rows of its proposals in slots/
+Addresses are stored lowercased (the csvs have them checksummed) and looked up in any case.
+
+Both are save_frame bundles, so lookups memory-map them and binary search the node list instead of
+reading anything whole. From the command line: python node_index.py <node address> [...]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from slot_data import DATA_DIR, load_frame, save_frame
+
+NODE_INDEX_DIR = DATA_DIR / 'node_index'
+SLOT_COLS = ('node_address', 'is_vanilla', 'correct_fee_recipient', 'in_smoothing_pool', 'max_bid',
+             'mev_reward', 'priority_fees', 'reth_portion')
+
+
+def build_node_index(df, mevboost_losses, vanilla_losses):
+    """write the index from the analysed slot frame and the loss frames of the two loss stages
+
+    mevboost_losses and vanilla_losses are the frames written to results/recipient_losses.csv and
+    results/vanilla_losses.csv. A slot is an offence if it used the wrong fee recipient or was a
+    vanilla block; lost_eth is that slot's loss estimate (0 for clean MEV-boost slots)
+    """
+    slots = df.loc[df['is_rocketpool'] & df['node_address'].notna(), list(SLOT_COLS)]
+    wrong_rcpt = (slots['correct_fee_recipient'] == False).fillna(False).to_numpy(dtype=bool)
+    lost_eth = vanilla_losses['lost_eth_bad_recipient'].fillna(
+        vanilla_losses['lost_eth_bid_estimate']).fillna(
+            vanilla_losses['lost_eth_nobid_neighborestimate'])
+    lost_eth = pd.concat([mevboost_losses['lost_eth'], lost_eth])
+    slots = slots.assign(wrong_recipient=wrong_rcpt,
+                         offence=wrong_rcpt | slots['is_vanilla'],
+                         lost_eth=lost_eth.reindex(slots.index).fillna(0))
+    # lowercase the categories (merging any that differ only in case) and put them in address
+    # order, since categoricals sort by category order
+    addresses = slots['node_address'].cat.remove_unused_categories()
+    lower = addresses.cat.categories.str.lower()
+    categories = np.unique(lower)
+    codes = np.searchsorted(categories, lower)[addresses.cat.codes.to_numpy()]
+    slots['node_address'] = pd.Categorical.from_codes(codes, categories)
+    slots = slots.reset_index().sort_values(['node_address', 'slot']).reset_index(drop=True)
+
+    # one groupby pass over the sorted proposals
+    offence_slot = slots['slot'].where(slots['offence'])
+    grouped = slots.assign(
+        mev=~slots['is_vanilla'],
+        wrong_recipient_mev=slots['wrong_recipient'] & ~slots['is_vanilla'],
+        wrong_recipient_vanilla=slots['wrong_recipient'] & slots['is_vanilla'],
+        lost_eth_wrong_recipient=slots['lost_eth'].where(slots['wrong_recipient'], 0),
+        lost_eth_vanilla=slots['lost_eth'].where(~slots['wrong_recipient'], 0),
+        offence_slot=offence_slot,
+        row=np.arange(len(slots)),
+    ).groupby('node_address', observed=True, sort=True)
+    nodes = grouped.agg(
+        proposals=('slot', 'size'),
+        mev=('mev', 'sum'),
+        vanilla=('is_vanilla', 'sum'),
+        wrong_recipient_mev=('wrong_recipient_mev', 'sum'),
+        wrong_recipient_vanilla=('wrong_recipient_vanilla', 'sum'),
+        lost_eth_wrong_recipient=('lost_eth_wrong_recipient', 'sum'),
+        lost_eth_vanilla=('lost_eth_vanilla', 'sum'),
+        first_slot=('slot', 'min'),
+        last_slot=('slot', 'max'),
+        first_offence_slot=('offence_slot', 'min'),
+        last_offence_slot=('offence_slot', 'max'),
+        start=('row', 'min'),
+    )
+    nodes['stop'] = nodes['start'] + nodes['proposals']
+    nodes['vanilla_mev_ratio'] = nodes['vanilla'] / nodes['mev']  # inf if never MEV-boost
+    # no offence -> -1, keeping the column integer
+    for col in ('first_offence_slot', 'last_offence_slot'):
+        nodes[col] = nodes[col].fillna(-1).astype(np.int64)
+    nodes = nodes.reset_index()  # node_address keeps the sorted categories, one per row
+
+    save_frame(slots, NODE_INDEX_DIR / 'slots')
+    save_frame(nodes, NODE_INDEX_DIR / 'nodes')
+    print(f'\nNode index: {len(nodes)} RP nodes, {len(slots)} proposals (see {NODE_INDEX_DIR})')
+    return nodes
+
+
+class NodeIndex:
+    """memory-mapped view of the index written by build_node_index"""
+
+    def __init__(self, path=NODE_INDEX_DIR):
+        self.nodes = load_frame(path / 'nodes')
+        self._addresses = np.asarray(self.nodes['node_address'].cat.categories, dtype=str)
+        self._slots_path = path / 'slots'
+
+    def _row(self, node_address):
+        node_address = node_address.lower()
+        i = np.searchsorted(self._addresses, node_address)
+        if i == len(self._addresses) or self._addresses[i] != node_address:
+            raise KeyError(node_address)
+        return i
+
+    def summary(self, node_address):
+        """the node's row of counts, losses and offence slots, as a Series; any case matches"""
+        return self.nodes.iloc[self._row(node_address)]
+
+    def proposals(self, node_address):
+        """the node's analysed proposals, by slot; only those rows are read off disk"""
+        row = self.nodes.iloc[self._row(node_address)]
+        return load_frame(self._slots_path,
+                          rows=slice(row['start'], row['stop'])).set_index('slot')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='look up nodes in the per-node index')
+    parser.add_argument('node_addresses', nargs='+')
+    parser.add_argument('--slots', action='store_true', help='also list each proposal')
+    args = parser.parse_args()
+    index = NodeIndex()
+    for addr in args.node_addresses:
+        print(f'\n=== {addr} ===')
+        try:
+            print(index.summary(addr).drop(['node_address', 'start', 'stop']).to_string())
+        except KeyError:
+            print('not in the index (no RP proposals in the analysed range)')
+            continue
+        if args.slots:
+            print(index.proposals(addr).drop(columns='node_address').to_string())
@@ -0,0 +1,72 @@
+"""Checking observed fee recipients against where a node's rewards should go
+
+An RP node's execution rewards should go to the smoothing pool if it's opted in, or otherwise to
+its own fee distributor (from ./data/node2distributor.json, see get_node2distributor_lut.py).
+validate_recipients does that for a whole batch of slots at once, with one join against the
+distributor table and one vectorized comparison, and reverify_correct_fee_recipient uses it to
+check the csvs' correct_fee_recipient column wherever an independent observation exists.
+"""
+from functools import lru_cache
+import json
+
+import numpy as np
+import pandas as pd
+
+from slot_data import DATA_DIR
+
+SMOOTHINGPOOLADDR = '0xd4E96eF8eee8678dBFf4d535E033Ed1a4F7605b7'
+LUT_PATH = DATA_DIR / 'node2distributor.json'
+
+
+@lru_cache(maxsize=None)
+def load_distributor_table(path=LUT_PATH):
+    """node_address -> lowercased distributor address, as a Series indexed by node_address"""
+    with open(path, 'r') as f:
+        lut = json.load(f)
+    return pd.Series(list(lut.values()), index=pd.Index(list(lut.keys()), name='node_address'),
+                     name='distributor', dtype=object).str.lower()
+
+
+def validate_recipients(batch, table=None):
+    """whether each row's observed_recipient is where its node's rewards should go
+
+    batch has node_address, in_smoothing_pool and observed_recipient columns (any index, eg slot).
+    Returns a nullable boolean Series on batch's index; NA where the node isn't in the distributor
+    table or the smoothing pool status or recipient is unknown
+    """
+    if table is None:
+        table = load_distributor_table()
+    merged = batch[['node_address', 'in_smoothing_pool', 'observed_recipient']].merge(
+        table, how='left', left_on='node_address', right_index=True)
+    in_sp = merged['in_smoothing_pool'].astype('boolean')
+    expected = merged['distributor'].where(~in_sp.fillna(False), SMOOTHINGPOOLADDR.lower())
+    observed = merged['observed_recipient'].astype(object).str.lower()
+    correct = pd.Series(pd.array(observed.to_numpy() == expected.to_numpy(), dtype='boolean'),
+                        index=batch.index)
+    unknown = (expected.isna() | observed.isna() | in_sp.isna()).to_numpy()
+    correct[unknown] = pd.NA
+    return correct
+
+
+def reverify_correct_fee_recipient(df, observed_recipients, table=None):
+    """recheck df's correct_fee_recipient for the slots in observed_recipients (slot -> address)
+
+    Returns (correct, disagreements): the recomputed flags for those slots, and the rows where they
+    differ from the csv's (with both values side by side)
+    """
+    slots = df.index.intersection(observed_recipients.index)
+    batch = df.loc[slots, ['node_address', 'in_smoothing_pool']].assign(
+        observed_recipient=observed_recipients.reindex(slots))
+    correct = validate_recipients(batch, table)
+    claimed = df.loc[slots, 'correct_fee_recipient'].astype('boolean')
+    differs = (claimed != correct).fillna(False).to_numpy(dtype=bool)
+    disagreements = batch[differs].assign(csv_correct_fee_recipient=claimed[differs],
+                                          recomputed=correct[differs])
+    return correct, disagreements
+
+
+def relay_recipients(journal, slots):
+    """slot -> producerFeeRecipient for the slots with a beaconcha.in relay record in journal"""
+    slots = [s for s in slots if journal.get(s) is not None]
+    return pd.Series([journal[s]['relay']['producerFeeRecipient'] for s in slots],
+                     index=pd.Index(np.asarray(slots, dtype=np.int64), name='slot'), dtype=object)
@@ -0,0 +1,210 @@
+"""Evaluate many parameter sets (scenarios) of the loss analysis over one loaded slot frame
+
+analysis.py hardwires a few assumptions: BID2REWARD is the mean of mev_reward / max_bid, the
+proxy_max_bid for vanilla slots without a bid is a centred 7-slot rolling mean, the analysis starts
+at the end of the grace period and RP slots with an avg_fee under 5% aren't counted as RP. To see
+how much the headline numbers (3a-4c and the APYs) depend on those, a scenario sets any of:
+- from_slot: first slot analysed
+- bid2reward: 'mean', 'median' or a number
+- window: proxy_max_bid window, in slots
+- min_avg_fee / max_avg_fee: RP slots with an avg_fee outside these don't count as RP (None for no
+  bound)
+- exclude: slot ranges ((first, last), ...) to leave out, eg a suspected client bug period
+Anything left out is as in DEFAULTS, which reproduces analysis.py's numbers.
+
+The slots are loaded and prepared once, for the widest range, and whatever doesn't depend on the
+scenario's numbers is computed once up front: mev_reward / max_bid, the slots removed as possibly
+bloxroute ethical, and the rolling window sums (incremental.window_sums, which leave bid2reward to
+be applied later) for each distinct row set and window. That frame is saved to
+./data/cache/scenarios, and worker processes memory-map it and evaluate the scenarios in parallel.
+The comparison table, one row per scenario, goes to results/scenarios.csv.
+
+Usage: python scenarios.py --bid2reward mean median --window 5 7 9 [--exclude none 7000000-7100000]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import pandas as pd
+
+from analysis import PENALTY_START_SLOT, get_rethdict, headline_numbers, vanilla_loss_columns
+from balances import load_balances
+from beaconchain import fetch_relays, load_journal
+from incremental import WINDOW, WINDOW_COLS, _removed_slots, proxy_max_bid, window_sums
+from instrument import worker_init
+from slot_data import (AVG_FEE_BOUNDS, CACHE_DIR, load_frame, load_slots, prepare_slot_frame,
+                       save_frame, select_shards, shard_index)
+
+SCENARIO_DIR = CACHE_DIR / 'scenarios'
+DEFAULTS = {
+    'from_slot': PENALTY_START_SLOT,
+    'bid2reward': 'mean',
+    'window': WINDOW,
+    'min_avg_fee': AVG_FEE_BOUNDS[0],
+    'max_avg_fee': None,
+    'exclude': (),
+}
+# all that the loss calculations need from the csvs
+LOAD_COLS = ('slot', 'proposer_index', 'max_bid', 'mev_reward', 'priority_fees', 'avg_fee',
+             'eth_collat_ratio', 'is_rocketpool', 'correct_fee_recipient')
+
+# set in each worker by _init_worker
+_frame = None
+_balances = None
+
+
+def grid(**options):
+    """a scenario per combination of options
+
+    eg grid(bid2reward=['mean', 'median'], window=[5, 7]) gives 4 scenarios
+    """
+    names = list(options)
+    return [dict(zip(names, values)) for values in product(*options.values())]
+
+
+def _scenario_rows(slots, scenario):
+    rows = slots >= scenario['from_slot']
+    for first, last in scenario['exclude']:
+        rows &= (slots < first) | (slots > last)
+    return rows
+
+
+def _init_worker(path):
+    global _frame, _balances
+    worker_init()
+    _frame = load_frame(path).set_index('slot')
+    _balances = load_balances()
+
+
+def evaluate(scenario, window_key, n_slots, start_slot, end_slot):
+    """headline numbers for one scenario, in a worker process set up by _init_worker"""
+    df = _frame[_scenario_rows(_frame.index.to_numpy(), scenario)]
+    bid2reward = scenario['bid2reward']
+    if bid2reward in ('mean', 'median'):
+        bid2reward = getattr(df['bid2reward_ratio'], bid2reward)()
+
+    df = df[~df['removed']]
+    is_rp = df['is_rocketpool'].fillna(False).to_numpy(dtype=bool)
+    if scenario['min_avg_fee'] is not None:
+        is_rp &= ~(df['avg_fee'] < scenario['min_avg_fee']).to_numpy()
+    if scenario['max_avg_fee'] is not None:
+        is_rp &= ~(df['avg_fee'] > scenario['max_avg_fee']).to_numpy()
+    sums = df[[f'{col}_{window_key}' for col in WINDOW_COLS]].set_axis(WINDOW_COLS, axis=1)
+    proxy = proxy_max_bid(sums, bid2reward)
+
+    df_rp = df[is_rp]
+    is_vanilla = df_rp['is_vanilla'].to_numpy()
+    mevboost = df_rp[~is_vanilla]
+    wrong = mevboost[mevboost['correct_fee_recipient'] == False]
+    mevboost_loss_df = pd.DataFrame({'lost_eth': wrong['mev_reward'] * wrong['reth_portion']})
+    vanilla_loss_df = vanilla_loss_columns(df_rp[is_vanilla], proxy[is_rp][is_vanilla], bid2reward)
+
+    wks = (n_slots * 12) / (60 * 60 * 24 * 7)
+    rethdict = get_rethdict(start_slot, end_slot, _balances)
+    numbers = headline_numbers(mevboost_loss_df, vanilla_loss_df, wks, rethdict, bid2reward)
+    return {
+        'slots': n_slots,
+        'rp_slots': len(df_rp),
+        'rp_vanilla_slots': int(is_vanilla.sum()),
+        'bid2reward_value': numbers.pop('bid2reward'),
+        **numbers,
+    }
+
+
+def _describe(scenario):
+    """scenario as flat table columns"""
+    return {**scenario,
+            'exclude': ';'.join(f'{first}-{last}' for first, last in scenario['exclude'])}
+
+
+def run_scenarios(scenarios, to_slot=None, workers=None):
+    """evaluate scenarios (dicts overriding DEFAULTS) from one load; returns the comparison table"""
+    scenarios = [{**DEFAULTS, **s} for s in scenarios]
+    for s in scenarios:
+        s['exclude'] = tuple(tuple(r) for r in s['exclude'])
+    from_slot = min(s['from_slot'] for s in scenarios)
+    shards = select_shards(shard_index(), from_slot, to_slot)
+    assert shards  # no data in range
+    paths = [p for _first, _last, p in shards]
+    end_slot = shards[-1][1] if to_slot is None else min(shards[-1][1], to_slot)
+
+    # missed slots are kept just long enough to count them, as analysis.py does
+    df, _ = load_slots(paths, (from_slot, to_slot), columns=LOAD_COLS)
+    all_slots = df['slot'].to_numpy()
+    df = df[df['proposer_index'].notna()].drop(columns='proposer_index')
+    df = prepare_slot_frame(df, from_slot, avg_fee_bounds=None)
+
+    d = load_journal()
+    d.update(fetch_relays([s for s in df[df['is_vanilla'] & df['is_rocketpool']].index
+                           if s not in d]))
+    df['removed'] = _removed_slots(df, d)
+    df['bid2reward_ratio'] = df['mev_reward'] / df['max_bid']
+
+    # rolling windows run over the slots left after removal, so they depend on the row set too
+    window_keys = {}
+    jobs = []
+    for s in scenarios:
+        key = (s['from_slot'], s['exclude'], s['window'])
+        if key not in window_keys:
+            window_keys[key] = len(window_keys)
+            rows = _scenario_rows(df.index.to_numpy(), s) & ~df['removed'].to_numpy()
+            sums = window_sums(df[rows], s['window'])
+            for col in WINDOW_COLS:
+                df[f'{col}_{window_keys[key]}'] = sums[col].reindex(df.index)
+        jobs.append((s, window_keys[key], int(_scenario_rows(all_slots, s).sum()),
+                     max(s['from_slot'], shards[0][0]), end_slot))
+    save_frame(df.reset_index(), SCENARIO_DIR)
+    print(f'{len(scenarios)} scenarios over {len(df)} slots; {len(window_keys)} rolling windows')
+
+    load_balances()  # refresh the cache here rather than in every worker at once
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(SCENARIO_DIR,)) as pool:
+        futures = [pool.submit(evaluate, *job) for job in jobs]
+        results = [fut.result() for fut in futures]
+    return pd.DataFrame([{**_describe(s), **r} for s, r in zip(scenarios, results)])
+
+
+def _exclusions(arg):
+    """'none' or 'first-last[,first-last...]'"""
+    if arg == 'none':
+        return ()
+    return tuple(tuple(int(x) for x in r.split('-')) for r in arg.split(','))
+
+
+def _bid2reward(arg):
+    return arg if arg in ('mean', 'median') else float(arg)
+
+
+def _optional_float(arg):
+    return None if arg == 'none' else float(arg)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--from-slot', type=int, nargs='+', default=[DEFAULTS['from_slot']])
+    parser.add_argument('--to-slot', type=int,
+                        help='last slot for every scenario (default: latest data)')
+    parser.add_argument('--bid2reward', type=_bid2reward, nargs='+', default=['mean'],
+                        help="'mean', 'median' (of mev_reward / max_bid) or a number")
+    parser.add_argument('--window', type=int, nargs='+', default=[WINDOW],
+                        help='proxy_max_bid rolling window sizes, in slots')
+    parser.add_argument('--min-avg-fee', type=_optional_float, nargs='+',
+                        default=[DEFAULTS['min_avg_fee']], help="a number or 'none'")
+    parser.add_argument('--max-avg-fee', type=_optional_float, nargs='+',
+                        default=[DEFAULTS['max_avg_fee']], help="a number or 'none'")
+    parser.add_argument('--exclude', type=_exclusions, nargs='+', default=[()],
+                        help="'none' or slot ranges FIRST-LAST[,FIRST-LAST...] to leave out; "
+                        "eg '--exclude none 7000000-7100000' compares with and without")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='scenarios evaluated in parallel (default: one per cpu)')
+    args = parser.parse_args()
+
+    table = run_scenarios(grid(from_slot=args.from_slot, bid2reward=args.bid2reward,
+                               window=args.window, min_avg_fee=args.min_avg_fee,
+                               max_avg_fee=args.max_avg_fee, exclude=args.exclude),
+                          args.to_slot, args.workers)
+    table.to_csv('./results/scenarios.csv', index_label='scenario')
+    with pd.option_context('display.width', 200, 'display.max_columns', None,
+                           'display.float_format', '{:0.3f}'.format):
+        print(table[[*DEFAULTS, 'bid2reward_value', '3a_eth_lost', 'vanilla_recipient_eth_lost',
+                     '4a_eth_lost', 'apy', '4c_apy_without_losses']].to_string())
+    print('\nfull table: results/scenarios.csv')
@@ -0,0 +1,281 @@
+"""Read-only local HTTP/JSON service over the results of the latest analysis.py run
+
+Answers from what analysis.py already wrote, without recomputing anything per request:
+- GET /headline: the 3a-4c numbers, bid2reward and run info from the latest ./reports run report
+- GET /nodes/<address>: a node's counts, losses and offence slots (from the node index, see
+  node_index.py); the address is matched case-insensitively
+- GET /nodes/<address>/proposals: each of the node's analysed proposals, with its loss estimate
+- GET /slots/<slot>: one analysed RP proposal
+- GET /losses?from_slot=..&to_slot=.. (or from_date/to_date, YYYY-MM-DD UTC, inclusive): ETH lost
+  per category over a slot range, clipped to the analysed range (which is the default)
+- GET /losses/by-bucket?from_slot=..&to_slot=..: the run's results/losses_by_<bucket>.csv rows
+  overlapping the range
+
+Everything is loaded (memory-mapped, for the node index) when a run report appears, along with a
+slot-ordered permutation of the proposals and per-category prefix sums of their losses, so a
+request is a binary search or two. A background thread checks ./reports every few seconds; when a
+newer report lands (analysis.py writes it last), the data is reloaded and swapped in whole, so a
+request sees either the old run or the new one. Only local files are read, so it works offline,
+eg on a synthetic.py data directory; query() answers without going through HTTP at all.
+
+Usage: python serve.py [--port 8000] [--host 127.0.0.1] [--reload-interval 5]
+"""
+import argparse
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+from pathlib import Path
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from analysis import date2slot
+from instrument import REPORTS_DIR
+from node_index import NODE_INDEX_DIR, NodeIndex
+from slot_data import load_frame
+
+RESULTS_DIR = Path('./results')
+PORT = 8000
+RELOAD_INTERVAL = 5  # seconds between checks for a new run report
+# the loss_timeseries categories, from the node index's per-proposal columns
+LOSS_CATEGORIES = ('lost_eth_mevboost_recipient', 'lost_eth_vanilla_recipient', 'lost_eth_vanilla')
+
+
+def _jsonable(value):
+    """plain python for json, through dicts and lists
+
+    NaN, inf (eg vanilla_mev_ratio of a node never using MEV-boost) and NA become null
+    """
+    if isinstance(value, dict):
+        return _record(value)
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    if value is pd.NA or value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _record(row):
+    return {key: _jsonable(value) for key, value in row.items()}
+
+
+def latest_report(reports_dir=REPORTS_DIR):
+    """path of the newest run report, or None; the names sort by time"""
+    reports = sorted(Path(reports_dir).glob('run-*.json'))
+    return reports[-1] if reports else None
+
+
+class Snapshot:
+    """everything served for one analysis run, with the indexes the queries use"""
+
+    def __init__(self, report_path, node_index_dir=NODE_INDEX_DIR, results_dir=RESULTS_DIR):
+        report_path = Path(report_path)
+        with open(report_path, 'r') as f:
+            report = json.load(f)
+        self.report_name = report_path.name
+        # reports written before non-finite numbers were mapped to null can hold NaN
+        self.headline = _record({'report': report_path.name,
+                                 **{k: v for k, v in report.items() if k != 'stages'}})
+        self.start_slot = report['start_slot']
+        self.end_slot = report['end_slot']
+
+        self.nodes = NodeIndex(node_index_dir)
+        # proposals are stored by node; keep a slot-ordered permutation for slot and range queries
+        self.slots = load_frame(node_index_dir / 'slots')
+        slot = self.slots['slot'].to_numpy()
+        self._by_slot = np.argsort(slot, kind='stable')
+        self._sorted_slots = slot[self._by_slot]
+        lost_eth = self.slots['lost_eth'].to_numpy()[self._by_slot]
+        wrong = self.slots['wrong_recipient'].to_numpy()[self._by_slot]
+        vanilla = self.slots['is_vanilla'].to_numpy()[self._by_slot]
+        self._loss_sums = {
+            cat: np.concatenate([[0], np.cumsum(np.where(mask, lost_eth, 0))])
+            for cat, mask in zip(LOSS_CATEGORIES, (wrong & ~vanilla, wrong & vanilla,
+                                                   ~wrong & vanilla))
+        }
+
+        self.bucket = report.get('bucket', 'week')
+        table = pd.read_csv(results_dir / f'losses_by_{self.bucket}.csv')
+        self._bucket_rows = [_record(row) for row in table.to_dict('records')]
+        self._bucket_start_slots = table['start_slot'].to_numpy()
+        self._bucket_end_slots = table['end_slot'].to_numpy()
+
+    def _summary(self, address):
+        try:
+            return self.nodes.summary(address)
+        except KeyError:
+            raise KeyError('node not in the index (no analysed RP proposals)') from None
+
+    def node(self, address):
+        """node index summary for address (any case); KeyError if it has no analysed proposals"""
+        return self._summary(address).drop(['start', 'stop'])
+
+    def proposals(self, address):
+        """the node's analysed proposals, by slot, from the already mapped slots bundle"""
+        row = self._summary(address)
+        return self.slots.iloc[row['start']:row['stop']].set_index('slot')
+
+    def slot(self, slot):
+        i = np.searchsorted(self._sorted_slots, slot)
+        if i == len(self._sorted_slots) or self._sorted_slots[i] != slot:
+            raise KeyError('slot is not an analysed RP proposal')
+        return self.slots.iloc[self._by_slot[i]]
+
+    def losses(self, from_slot, to_slot):
+        """ETH lost per category in slots from_slot to to_slot (inclusive)"""
+        lo = np.searchsorted(self._sorted_slots, from_slot, side='left')
+        hi = np.searchsorted(self._sorted_slots, to_slot, side='right')
+        losses = {cat: float(sums[hi] - sums[lo]) for cat, sums in self._loss_sums.items()}
+        return {'from_slot': from_slot, 'to_slot': to_slot, 'rp_proposals': int(hi - lo),
+                **losses, 'lost_eth_total': sum(losses.values())}
+
+    def buckets(self, from_slot, to_slot):
+        """rows of the run's losses_by_<bucket>.csv overlapping from_slot to to_slot"""
+        lo = np.searchsorted(self._bucket_end_slots, from_slot, side='left')
+        hi = np.searchsorted(self._bucket_start_slots, to_slot, side='right')
+        return {'bucket': self.bucket, 'rows': self._bucket_rows[lo:hi]}
+
+
+def _slot_range(snapshot, params):
+    """(from_slot, to_slot) from the query parameters, defaulting to the analysed range
+
+    The range is clipped to the analysed slots; ValueError if it's inverted or entirely outside
+    """
+    if ('from_slot' in params and 'from_date' in params) or ('to_slot' in params and
+                                                               'to_date' in params):
+        raise ValueError('give a slot or a date for each end of the range, not both')
+    try:
+        from_slot = int(params.get('from_slot', snapshot.start_slot))
+        to_slot = int(params.get('to_slot', snapshot.end_slot))
+        if 'from_date' in params:
+            from_slot = date2slot(params['from_date'])
+        if 'to_date' in params:
+            next_day = date.fromisoformat(params['to_date']) + timedelta(days=1)
+            to_slot = date2slot(next_day.isoformat()) - 1
+    except ValueError:
+        raise ValueError('slots are integers and dates are YYYY-MM-DD') from None
+    if from_slot > to_slot:
+        raise ValueError(f'the range starts after it ends ({from_slot} > {to_slot})')
+    if to_slot < snapshot.start_slot or from_slot > snapshot.end_slot:
+        raise ValueError(f'the range is outside the analysed slots '
+                         f'({snapshot.start_slot}-{snapshot.end_slot})')
+    return max(from_slot, snapshot.start_slot), min(to_slot, snapshot.end_slot)
+
+
+def query(snapshot, path, params=None):
+    """the json-ready answer for a request path (eg '/nodes/0xabc...'); KeyError for an unknown
+    path or item, ValueError for bad parameters"""
+    params = params or {}
+    parts = [p for p in path.split('/') if p]
+    if parts == ['headline']:
+        return snapshot.headline
+    if len(parts) in (2, 3) and parts[0] == 'nodes':
+        if len(parts) == 2:
+            return _record(snapshot.node(parts[1]))
+        if parts[2] == 'proposals':
+            proposals = snapshot.proposals(parts[1]).drop(columns='node_address').reset_index()
+            return [_record(row) for row in proposals.to_dict('records')]
+    if len(parts) == 2 and parts[0] == 'slots':
+        try:
+            slot = int(parts[1])
+        except ValueError:
+            raise ValueError('slot must be an integer') from None
+        return _record(snapshot.slot(slot))
+    if parts == ['losses']:
+        return snapshot.losses(*_slot_range(snapshot, params))
+    if parts == ['losses', 'by-bucket']:
+        return snapshot.buckets(*_slot_range(snapshot, params))
+    raise KeyError(f'unknown path {path}')
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET only; answers with json (and an 'error' key on failure)"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        snapshot = self.server.snapshot  # one run for the whole request, even mid-reload
+        status = 200
+        try:
+            if snapshot is None:
+                status, body = 503, {'error': f'no analysis run report in {REPORTS_DIR} yet'}
+            else:
+                body = query(snapshot, url.path, params)
+        except KeyError as e:
+            status, body = 404, {'error': e.args[0]}
+        except ValueError as e:
+            status, body = 400, {'error': str(e)}
+        try:
+            data = json.dumps(body, allow_nan=False).encode()
+        except (TypeError, ValueError) as e:
+            status = 500
+            data = json.dumps({'error': f'answer is not json-serialisable ({e})'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def reload_if_new(server):
+    """swap in the latest run's data if a newer run report has landed; a report that can't be read
+    yet (eg still being written) is retried next time"""
+    path = latest_report()
+    if path is None or (server.snapshot is not None and server.snapshot.report_name == path.name):
+        return
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f'WARNING: could not load {path.name} ({e!r}); still serving the previous run')
+        return
+    server.snapshot = snapshot
+    print(f'serving {path.name} ({len(snapshot.slots)} proposals, '
+          f'slots {snapshot.start_slot}-{snapshot.end_slot})')
+
+
+def make_server(host='127.0.0.1', port=PORT, reload_interval=RELOAD_INTERVAL, verbose=False):
+    """a server with the latest run loaded and a reload thread running; call serve_forever()"""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.snapshot = None
+    server.verbose = verbose
+    reload_if_new(server)
+
+    def watch():
+        while True:
+            time.sleep(reload_interval)
+            reload_if_new(server)
+
+    threading.Thread(target=watch, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help='seconds between checks for a new run report')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.reload_interval, args.verbose)
+    print(f'listening on http://{args.host}:{args.port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
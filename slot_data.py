@@ -0,0 +1,302 @@
+"""Loading of the per-slot rockettheft_slot-###-to-###.csv files
+
+Parsing the csvs (wei strings, true/false/blank columns, repeated relay and node strings) is the
+slow part of a run, so each csv gets a columnar cache under ./data/cache/<csv stem>/ holding one
+.npy file per column plus a meta.json. The cache is keyed on the source file's name, size and mtime;
+a csv that changed is re-parsed and re-cached, the rest are memory-mapped straight back in.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+from pathlib import Path
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+DATA_DIR = Path('./data')
+CACHE_DIR = DATA_DIR / 'cache'
+CACHE_VERSION = 2
+
+# wei-denominated columns; held as float64 ETH
+ETH_COLS = ('max_bid', 'mev_reward', 'priority_fees', 'avg_fee', 'eth_collat_ratio')
+# true/false/blank columns; held as nullable booleans, cached as int8 with -1 for blank
+BOOL_COLS = ('is_rocketpool', 'in_smoothing_pool', 'correct_fee_recipient')
+# low-cardinality strings; held as categoricals, cached as int32 codes plus the category list
+CATEGORY_COLS = ('max_bid_relay', 'mev_reward_relay', 'node_address')
+# small ints with blanks (missed slots); held as nullable Int32, cached as int32 with -1 for blank
+INT_COLS = ('proposer_index',)
+# avg_fee (node commission) outside these is suspect; under the low end isn't counted as RP
+AVG_FEE_BOUNDS = (0.05, 0.2)
+
+SHARD_RE = re.compile(r'rockettheft_slot-(\d+)-to-(\d+)\.csv')
+
+
+def read_slot_csv(p, exact_wei=False):
+    """parse a csv without touching the cache
+
+    The wei columns are parsed straight to float64 by the csv reader and scaled in one step. With
+    float_precision='round_trip' the parse is correctly rounded, so this gives bit-for-bit the same
+    ETH values as int(wei) / 1e18 per cell. exact_wei=True instead keeps those columns as python
+    ints (in wei, NaN for blank) for audits where float rounding matters; it's for use from python
+    only, since the analysis itself works in float ETH.
+    """
+    dtype = {col: 'boolean' for col in BOOL_COLS}
+    dtype.update({col: 'category' for col in CATEGORY_COLS})
+    dtype.update({col: 'Int32' for col in INT_COLS})
+    if exact_wei:
+        dtype.update({col: str for col in ETH_COLS})
+        df = pd.read_csv(p, dtype=dtype)
+        for col in ETH_COLS:
+            df[col] = df[col].map(int, na_action='ignore').astype(object)
+        return df
+
+    dtype.update({col: 'float64' for col in ETH_COLS})
+    df = pd.read_csv(p, dtype=dtype, float_precision='round_trip')
+    # eth_collat_ratio is (node capital + user capital) / node capital
+    df[list(ETH_COLS)] = df[list(ETH_COLS)] / 1e18
+    return df
+
+
+def _source_key(p):
+    st = Path(p).stat()
+    return {'source': Path(p).name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _cache_is_fresh(cache_path, p):
+    try:
+        with open(cache_path / 'meta.json', 'r') as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return False
+    key = _source_key(p)
+    return meta['version'] == CACHE_VERSION and all(meta[k] == v for k, v in key.items())
+
+
+def save_frame(df, path, **meta):
+    """write df as one .npy per column plus a meta.json (with meta merged in) under path
+
+    Used for the csv cache and for other derived per-slot frames. The directory is swapped in whole,
+    and meta.json is written last, so a half-written frame never looks complete.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    columns = {}
+    for col in df.columns:
+        ser = df[col]
+        if col in BOOL_COLS:
+            arr = ser.astype('Int8').fillna(-1).to_numpy(dtype='int8')
+            columns[col] = {'kind': 'bool'}
+        elif col in INT_COLS:
+            arr = ser.fillna(-1).to_numpy(dtype='int32')
+            columns[col] = {'kind': 'int'}
+        elif col in CATEGORY_COLS:
+            arr = ser.cat.codes.to_numpy(dtype='int32')
+            columns[col] = {'kind': 'category', 'categories': [str(c) for c in ser.cat.categories]}
+        else:
+            arr = ser.to_numpy()
+            columns[col] = {'kind': 'numeric'}
+        np.save(tmp_path / f'{col}.npy', arr)
+
+    with open(tmp_path / 'meta.json', 'w') as f:
+        json.dump({'version': CACHE_VERSION, **meta, 'columns': columns}, f, indent=1)
+    shutil.rmtree(path, ignore_errors=True)
+    tmp_path.replace(path)
+
+
+def load_frame(path, columns=None, rows=None):
+    """read back a frame written by save_frame, memory-mapping the numeric columns
+
+    rows (anything that indexes a numpy array) limits which rows are read off disk
+    """
+    path = Path(path)
+    with open(path / 'meta.json', 'r') as f:
+        meta = json.load(f)
+
+    data = {}
+    for col, info in meta['columns'].items():
+        if columns is not None and col not in columns:
+            continue
+        arr = np.load(path / f'{col}.npy', mmap_mode='r')
+        if rows is not None:
+            arr = arr[rows]
+        if info['kind'] == 'bool':
+            data[col] = pd.arrays.BooleanArray(arr == 1, arr == -1)
+        elif info['kind'] == 'int':
+            data[col] = pd.arrays.IntegerArray(np.asarray(arr), arr == -1)
+        elif info['kind'] == 'category':
+            data[col] = pd.Categorical.from_codes(arr, categories=info['categories'])
+        else:
+            data[col] = arr
+    return pd.DataFrame(data)
+
+
+def _in_range(slots, slot_range):
+    from_slot, to_slot = slot_range
+    mask = np.ones(len(slots), dtype=bool)
+    if from_slot is not None:
+        mask &= slots >= from_slot
+    if to_slot is not None:
+        mask &= slots <= to_slot
+    return mask
+
+
+def load_slot_csv(p, columns=None, use_cache=True, exact_wei=False, slot_range=None):
+    """load one csv, via its columnar cache when possible
+
+    columns limits which columns come back; with a fresh cache the others are never read at all.
+    slot_range=(from_slot, to_slot), inclusive with None for open-ended, limits the rows; with a
+    fresh cache only the matching rows are read. exact_wei (see read_slot_csv) always re-parses,
+    since the cache only holds ETH floats.
+    """
+    p = Path(p)
+    if exact_wei or not use_cache:
+        df = read_slot_csv(p, exact_wei=exact_wei)
+        if slot_range is not None:
+            df = df[_in_range(df['slot'].to_numpy(), slot_range)].reset_index(drop=True)
+        return df if columns is None else df[[c for c in df.columns if c in columns]]
+
+    cache_path = CACHE_DIR / p.stem
+    if not _cache_is_fresh(cache_path, p):
+        save_frame(read_slot_csv(p), cache_path, **_source_key(p))
+    rows = None
+    if slot_range is not None:
+        slots = np.load(cache_path / 'slot.npy', mmap_mode='r')
+        rows = np.flatnonzero(_in_range(slots, slot_range))
+    return load_frame(cache_path, columns, rows)
+
+
+def shard_index(data_dir=DATA_DIR):
+    """[(first_slot, last_slot, path), ...] for the csvs in data_dir, by first slot
+
+    The slot range comes from the file name, so nothing is opened. Gaps between consecutive csvs
+    are printed as warnings; overlapping csvs are a ValueError, since their common slots would be
+    loaded twice.
+    """
+    shards = []
+    for p in Path(data_dir).glob('*.csv'):
+        m = SHARD_RE.fullmatch(p.name)
+        if m is None:
+            print(f'WARNING: ignoring {p.name}; not a rockettheft_slot-###-to-###.csv file')
+            continue
+        shards.append((int(m[1]), int(m[2]), p))
+    shards.sort()
+
+    overlaps = []
+    for (_, prev_last, prev_p), (first, _, p) in zip(shards, shards[1:]):
+        if first > prev_last + 1:
+            print(f'WARNING: gap of {first - prev_last - 1} slots between {prev_p.name} and '
+                  f'{p.name}')
+        elif first <= prev_last:
+            overlaps.append(f'{prev_p.name} and {p.name} by {prev_last - first + 1} slots')
+    if overlaps:
+        raise ValueError(f'overlapping csvs in {data_dir} (remove the stale ones): '
+                         f'{"; ".join(overlaps)}')
+    return shards
+
+
+def select_shards(shards, from_slot=None, to_slot=None):
+    """the shards (from shard_index) that overlap [from_slot, to_slot]"""
+    return [(first, last, p) for first, last, p in shards
+            if (from_slot is None or last >= from_slot) and (to_slot is None or first <= to_slot)]
+
+
+def _load_shard(p, slot_range, drop_missed, columns):
+    df = load_slot_csv(p, columns=columns, slot_range=slot_range)
+    n_slots = len(df)
+    if drop_missed:
+        df = df[df['proposer_index'].notna()].reset_index(drop=True)
+    return df, n_slots
+
+
+def refresh_caches(paths, workers=None):
+    """parse, in a process pool, the csvs in paths whose columnar cache is missing or stale"""
+    stale = [Path(p) for p in paths if not _cache_is_fresh(CACHE_DIR / Path(p).stem, p)]
+    if len(stale) <= 1 or workers == 1:
+        for p in stale:
+            load_slot_csv(p, columns=[])
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        list(pool.map(load_slot_csv, stale, [[]] * len(stale)))
+
+
+def iter_slot_frames(paths, slot_range=None, drop_missed=False, columns=None, workers=None):
+    """yield (frame, slots in range) for each csv in paths, in order
+
+    Csvs that need parsing are parsed and cached in parallel first (the slow part); then each shard
+    is read back from its cache with the slot range and (with drop_missed) missed-slot filters
+    applied to that shard alone, so only the kept rows are ever held. The slot count still
+    includes missed slots. Consumers can aggregate shard by shard, or hand everything to
+    concat_slot_frames (see load_slots)
+    """
+    paths = list(paths)
+    refresh_caches(paths, workers)
+    for p in paths:
+        yield _load_shard(p, slot_range, drop_missed, columns)
+
+
+def load_slots(paths, slot_range=None, drop_missed=False, columns=None, workers=None):
+    """(one frame for all of paths, number of slots in range); see iter_slot_frames"""
+    paths = list(paths)
+    df_ls = []
+    n_slots = 0
+    frames = iter_slot_frames(paths, slot_range, drop_missed, columns, workers)
+    for (df, n), p in zip(frames, paths):
+        print(p.name)
+        df_ls.append(df)
+        n_slots += n
+    return concat_slot_frames(df_ls), n_slots
+
+
+def concat_slot_frames(df_ls):
+    """pd.concat, but keeping categoricals categorical (plain concat falls back to object when the
+    category lists differ between csvs)"""
+    df_ls = [df.copy(deep=False) for df in df_ls]
+    for col in CATEGORY_COLS:
+        if not df_ls or col not in df_ls[0].columns:
+            continue
+        categories = union_categoricals([df[col] for df in df_ls], ignore_order=True).categories
+        for df in df_ls:
+            df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(df_ls, ignore_index=True)
+
+
+def prepare_slot_frame(df, penalty_start_slot, avg_fee_bounds=AVG_FEE_BOUNDS):
+    """filter to the penalty period, sanity check fees and add the derived per-slot columns
+
+    Returns a frame indexed by slot; missed slots (no proposer) are still in it. avg_fee_bounds=None
+    skips the fee sanity check, leaving is_rocketpool as it is in the csvs
+    """
+    df = df[df['slot'] >= penalty_start_slot]
+
+    df['is_vanilla'] = df['mev_reward'].isna()  # make a convenience column
+    low, high = (-np.inf, np.inf) if avg_fee_bounds is None else avg_fee_bounds
+    try:
+        assert ((sum(df['avg_fee'] > high) + sum(df['avg_fee'] < low)) == 0)  # sanity check
+    except AssertionError:
+        over20 = df[df['avg_fee'] > high]
+        if len(over20):
+            print(f'WARNING: over {100*high:g}%')
+            print(over20)
+        under5 = df[df['avg_fee'] < low]
+        if len(under5):
+            print(f'ERROR: under {100*low:g}%; related to incomplete solo migrations;'
+                  'setting is_rocketpool to False')
+            print(under5)
+            df.loc[df['avg_fee'] < low, 'is_rocketpool'] = False
+    df['reth_portion'] = (1 - (df['avg_fee'])) * (1 - (1 / df['eth_collat_ratio']))
+    df.set_index('slot', inplace=True)
+    return df
+
+
+def needs_proxy_bid(df):
+    """MEV-boost slots whose max_bid is missing or below the delivered reward (mostly bloxroute)"""
+    has_bid = df['max_bid'].notna()
+    has_reward = df['mev_reward'].notna()
+    missing_bid = ~has_bid & has_reward
+    missing_winning_bid = has_bid & has_reward & (df['max_bid'] < df['mev_reward'])
+    return missing_bid, missing_winning_bid
@@ -0,0 +1,127 @@
+"""Convert builder-submissions-*.json.gz dumps into bid-values-*.json.gz (and optionally max bids)
+
+Replaces submissions-to-bids.sh. The input is a gzipped JSON array of submissions with at least
+`slot` and `value`; the output is the same single JSON object the jq script produced, slot ->
+[value, ...], written compactly and gzipped, with slots in increasing order.
+
+The array is parsed one element at a time, and since submissions arrive (roughly) in slot order,
+a slot's values are written out and dropped from memory once a submission WINDOW slots later has
+been seen. A submission arriving after its slot was written is counted and reported, but can't be
+added any more; rerun with a bigger --window if that happens. With --max-bids, the highest value
+per slot is also written to max-bids-*.csv (slot,max_bid in wei, as in the rockettheft_slot csvs);
+that is exact regardless of the window.
+
+Usage: python submissions_to_bids.py builder-submissions-*.json.gz [--max-bids] [--workers N]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import json
+from pathlib import Path
+import re
+
+WINDOW = 64  # slots a submission may arrive out of order
+CHUNK_SIZE = 1 << 20  # characters read at a time
+
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """yield the elements of the JSON array in text file f without reading it all in"""
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size).lstrip()
+    if not buf.startswith('['):
+        raise ValueError('input is not a JSON array')
+    pos = 1
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            if pos == len(buf):
+                raise json.JSONDecodeError('need more input', buf, pos)
+            element, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = f.read(chunk_size)
+            if not more:
+                raise ValueError('input ends in the middle of the array') from None
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield element
+
+
+def convert(path, window=WINDOW, max_bids=False):
+    """write the bid-values file (and max-bids csv) for one builder-submissions file
+
+    Returns a small summary dict
+    """
+    path = Path(path)
+    out_path = path.with_name(path.name.replace('builder-submissions', 'bid-values'))
+    if out_path == path:
+        raise ValueError(f'{path.name} has no builder-submissions in its name')
+    tmp_path = out_path.with_name(out_path.name + '.tmp')
+
+    open_slots = {}  # slot -> values, not yet written
+    written_through = -1  # every slot up to here has been written
+    highest = {}  # slot -> max value (as int), only with max_bids
+    n_submissions = n_late = 0
+
+    with gzip.open(path, 'rt') as f_in, gzip.open(tmp_path, 'wt') as f_out:
+        first = True
+
+        def write(slots):
+            nonlocal first
+            for slot in slots:
+                f_out.write(('{' if first else ',') + json.dumps(str(slot)) + ':' +
+                            json.dumps(open_slots.pop(slot), separators=(',', ':')))
+                first = False
+
+        for sub in iter_json_array(f_in):
+            n_submissions += 1
+            slot = int(sub['slot'])
+            if max_bids:
+                value = int(sub['value'])
+                if value > highest.get(slot, -1):
+                    highest[slot] = value
+            if slot <= written_through:
+                n_late += 1
+                continue
+            if slot not in open_slots:
+                # a new slot; anything WINDOW or more behind it is done
+                ready = sorted(s for s in open_slots if s <= slot - window)
+                write(ready)
+                written_through = max(written_through, ready[-1] if ready else -1)
+                open_slots[slot] = []
+            open_slots[slot].append(sub['value'])
+        write(sorted(open_slots))
+        f_out.write('{}\n' if first else '}\n')
+    tmp_path.replace(out_path)
+
+    if max_bids:
+        csv_path = path.with_name(
+            path.name.replace('builder-submissions', 'max-bids').removesuffix('.json.gz') + '.csv')
+        with open(csv_path, 'w') as f:
+            f.write('slot,max_bid\n')
+            f.writelines(f'{slot},{value}\n' for slot, value in sorted(highest.items()))
+
+    if n_late:
+        print(f'WARNING: {path.name}: {n_late} submissions arrived more than {window} slots late '
+              f'and are missing from {out_path.name}; rerun with a bigger --window')
+    return {'file': path.name, 'submissions': n_submissions, 'late': n_late}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('paths', nargs='+', help='builder-submissions-*.json.gz files')
+    parser.add_argument('--max-bids', action='store_true', help='also write max-bids-*.csv')
+    parser.add_argument('--window', type=int, default=WINDOW,
+                        help='slots a submission may arrive out of order')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='files converted in parallel (default: one per cpu)')
+    args = parser.parse_args()
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(convert, p, args.window, args.max_bids) for p in args.paths]
+        for fut in futures:
+            summary = fut.result()
+            print(f"{summary['file']}: {summary['submissions']} submissions")
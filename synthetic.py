@@ -0,0 +1,160 @@
+"""Synthetic input data for analysis.py, for benchmarking and trying changes without the archive
+
+Writes a ./data-style directory: rockettheft_slot-*.csv shards in the real column format,
+balances.jsonl covering the slots, node2distributor.json for the nodes used, and a
+remove_bloxroute_ethical.jsonl journal with an entry for every RP vanilla slot, so analysis.py
+never has to go to beaconcha.in. Values are drawn from rough fits to the real data (lognormal bids,
+rewards a bit under the bid, a few percent of bloXroute payloads without a usable bid); the rates
+of the things the analysis looks for are parameters.
+
+Usage: python synthetic.py <out dir> <number of slots> [--seed N] [--rp-rate 0.3] [...]
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analysis import PENALTY_START_SLOT, slot2timestamp
+from recipients import SMOOTHINGPOOLADDR
+
+SHARD_SIZE = 100_000
+RELAYS = ('Flashbots', 'Ultra Sound', 'Aestus', 'Agnostic Gnosis', 'bloXroute Max Profit',
+          'bloXroute Regulated')
+DEFAULT_RATES = {
+    'missed_rate': 0.01,  # slots without a block
+    'bid_rate': 0.9,  # slots with a max_bid from an approved relay
+    'vanilla_rate': 0.1,  # of the slots with a bid, ones that were built locally anyway
+    'rp_rate': 0.3,  # proposals by Rocket Pool validators
+    'smoothing_pool_rate': 0.4,  # of RP proposals
+    'wrong_recipient_rate': 0.05,  # of RP proposals
+    'bloxroute_missing_rate': 0.03,  # of MEV-boost payloads; bloXroute without a usable bid
+    'bloxroute_ethical_rate': 0.2,  # of RP vanilla proposals; tagged bloxroute-ethical
+}
+
+
+def _hex_addresses(rng, n):
+    digits = np.array(list('0123456789abcdefABCDEF'))
+    return ['0x' + ''.join(row) for row in digits[rng.integers(0, len(digits), size=(n, 40))]]
+
+
+def _bools(mask, present):
+    """'true'/'false', blank where not present"""
+    return np.where(present, np.where(mask, 'true', 'false'), '')
+
+
+def generate_shard(rng, first_slot, last_slot, nodes, distributors, rates):
+    """(csv frame, journal records) for one shard"""
+    n = last_slot - first_slot + 1
+    slots = np.arange(first_slot, last_slot + 1)
+    block = rng.random(n) >= rates['missed_rate']
+    has_bid = block & (rng.random(n) < rates['bid_rate'])
+    vanilla = block & (~has_bid | (rng.random(n) < rates['vanilla_rate']))
+    mev = block & ~vanilla
+
+    bid = np.minimum(rng.lognormal(38, 1.2, n), 9e18).astype(np.int64)
+    reward = (bid * rng.uniform(0.85, 1.0, n)).astype(np.int64)
+    bid_relay = np.asarray(RELAYS)[rng.integers(0, len(RELAYS), n)]
+    reward_relay = np.asarray(RELAYS)[rng.integers(0, len(RELAYS), n)]
+    # bloXroute payloads whose bid is missing, or lower than what was delivered
+    bloxroute = mev & (rng.random(n) < rates['bloxroute_missing_rate'])
+    reward_relay[bloxroute] = 'bloXroute Max Profit'
+    no_bid = bloxroute & (rng.random(n) < 0.5)
+    bid[bloxroute & ~no_bid] = (reward[bloxroute & ~no_bid] * 0.95).astype(np.int64)
+    has_bid &= ~no_bid
+
+    rp = block & (rng.random(n) < rates['rp_rate'])
+    node_ind = rng.integers(0, len(nodes), n)
+    in_sp = rng.random(n) < rates['smoothing_pool_rate']
+    correct = rng.random(n) >= rates['wrong_recipient_rate']
+    avg_fee = np.where(rng.random(n) < 0.5, 14, 15) * 10**16
+    collat = np.where(rng.random(n) < 0.5, 2, 4) * 10**18
+
+    df = pd.DataFrame({
+        'slot': slots,
+        'max_bid': pd.array(np.where(has_bid, bid, 0), dtype='Int64'),
+        'max_bid_relay': np.where(has_bid, bid_relay, ''),
+        'mev_reward': pd.array(np.where(mev, reward, 0), dtype='Int64'),
+        'mev_reward_relay': np.where(mev, reward_relay, ''),
+        'proposer_index': pd.array(rng.integers(1, 1_000_000, n), dtype='Int64'),
+        'is_rocketpool': _bools(rp, block),
+        'node_address': np.where(rp, np.asarray(nodes)[node_ind], ''),
+        'in_smoothing_pool': _bools(in_sp, rp),
+        'correct_fee_recipient': _bools(correct, rp),
+        'priority_fees': pd.array(rng.lognormal(37, 1, n).astype(np.int64), dtype='Int64'),
+        'avg_fee': pd.array(avg_fee, dtype='Int64'),
+        'eth_collat_ratio': pd.array(collat, dtype='Int64'),
+    })
+    df.loc[~has_bid, 'max_bid'] = pd.NA
+    df.loc[~mev, 'mev_reward'] = pd.NA
+    df.loc[~block, 'proposer_index'] = pd.NA
+    df.loc[~(rp & vanilla), 'priority_fees'] = pd.NA
+    df.loc[~rp, ['avg_fee', 'eth_collat_ratio']] = pd.NA
+
+    # beaconcha.in's view of the RP vanilla slots
+    journal = []
+    tagged = rng.random(n) < rates['bloxroute_ethical_rate']
+    for i in np.flatnonzero(rp & vanilla):
+        data = None
+        if tagged[i]:
+            recipient = SMOOTHINGPOOLADDR if in_sp[i] else distributors[node_ind[i]]
+            data = {
+                'relay': {
+                    'tag': 'bloxroute-ethical',
+                    'producerFeeRecipient': recipient if correct[i] else _hex_addresses(rng, 1)[0]
+                },
+                'blockMevReward': int(reward[i]),
+            }
+        journal.append({'slot': int(slots[i]), 'data': data})
+    return df, journal
+
+
+def write_balances(path, first_slot, last_slot, rng):
+    """hourly balance entries from a day before first_slot to a day after last_slot"""
+    times = np.arange(slot2timestamp(first_slot) - 86400, slot2timestamp(last_slot) + 86400, 3600)
+    total_eth = 500_000e18 + np.cumsum(rng.uniform(2, 4, len(times)) * 1e18)
+    reth = 470_000 * 10**18
+    with open(path, 'w') as f:
+        for i, (t, eth) in enumerate(zip(times, total_eth)):
+            block = 16_000_000 + 300 * i
+            f.write(json.dumps([hex(block), hex(int(eth)), hex(int(eth)), hex(reth), hex(int(t))]) +
+                    '\n')
+
+
+def generate(out_dir, n_slots, first_slot=PENALTY_START_SLOT, shard_size=SHARD_SIZE, n_nodes=2000,
+             seed=0, **rates):
+    """write a synthetic data directory for n_slots slots from first_slot; see DEFAULT_RATES"""
+    rates = {**DEFAULT_RATES, **rates}
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    nodes = _hex_addresses(rng, n_nodes)
+    distributors = _hex_addresses(rng, n_nodes)
+    with open(out_dir / 'node2distributor.json', 'w') as f:
+        json.dump(dict(zip(nodes, distributors)), f, indent=4, sort_keys=True)
+
+    last_slot = first_slot + n_slots - 1
+    with open(out_dir / 'remove_bloxroute_ethical.jsonl', 'w') as f_journal:
+        for start in range(first_slot, last_slot + 1, shard_size):
+            end = min(start + shard_size - 1, last_slot)
+            df, journal = generate_shard(rng, start, end, nodes, distributors, rates)
+            df.to_csv(out_dir / f'rockettheft_slot-{start}-to-{end}.csv', index=False)
+            f_journal.writelines(json.dumps(rec) + '\n' for rec in journal)
+    write_balances(out_dir / 'balances.jsonl', first_slot, last_slot, rng)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('out_dir')
+    parser.add_argument('n_slots', type=int)
+    parser.add_argument('--first-slot', type=int, default=PENALTY_START_SLOT)
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--nodes', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    for name, value in DEFAULT_RATES.items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=float, default=value)
+    args = parser.parse_args()
+    generate(args.out_dir, args.n_slots, args.first_slot, args.shard_size, args.nodes, args.seed,
+             **{name: getattr(args, name) for name in DEFAULT_RATES})
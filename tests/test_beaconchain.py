@@ -0,0 +1,123 @@
+"""fetch_relays against a local stub of the beaconcha.in API"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+import beaconchain
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/api/v1/slot/<n> -> block n; /api/v1/execution/block/<n> -> tagged if n is even
+
+    server.failures maps a path to the statuses to answer with before succeeding
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        failures = self.server.failures.get(self.path)
+        if failures:
+            status, headers = failures.pop(0)
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            return
+        n = int(self.path.rsplit('/', 1)[1])
+        if self.path.startswith('/api/v1/slot/'):
+            body = {'data': {'exec_block_number': n}}
+        else:
+            relay = {'tag': 'bloxroute-ethical', 'producerFeeRecipient': '0xabc'}
+            body = {'data': [{'relay': relay if n % 2 == 0 else None, 'blockMevReward': n}]}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    server.failures = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """record retry sleeps instead of sleeping"""
+    recorded = []
+    monkeypatch.setattr(beaconchain.time, 'sleep', recorded.append)
+    return recorded
+
+
+def _fetch(stub, slots, journal_path):
+    return beaconchain.fetch_relays(slots, journal_path=journal_path,
+                                    base_url=f'http://127.0.0.1:{stub.server_port}',
+                                    requests_per_minute=60_000)
+
+
+def test_retries_429_with_retry_after_and_5xx(stub, sleeps, tmp_path):
+    stub.failures['/api/v1/slot/1'] = [(429, {'Retry-After': '7'})]
+    stub.failures['/api/v1/execution/block/2'] = [(503, {}), (502, {})]
+    d = _fetch(stub, [1, 2, 3], tmp_path / 'journal.jsonl')
+
+    assert d[1] is None and d[3] is None
+    assert d[2]['relay']['tag'] == 'bloxroute-ethical'
+    assert stub.requests.count('/api/v1/slot/1') == 2
+    assert stub.requests.count('/api/v1/execution/block/2') == 3
+    assert 7.0 in sleeps  # Retry-After was honoured
+    assert [2.0, 4.0] == [s for s in sleeps if s in (2.0, 4.0)]  # exponential backoff
+    assert beaconchain.load_journal(tmp_path / 'journal.jsonl', tmp_path / 'none.pkl') == d
+
+
+def test_client_errors_are_not_retried_or_journaled(stub, sleeps, tmp_path):
+    stub.failures['/api/v1/slot/5'] = [(404, {})]
+    d = _fetch(stub, [4, 5], tmp_path / 'journal.jsonl')
+
+    assert list(d) == [4]
+    assert stub.requests.count('/api/v1/slot/5') == 1
+    assert list(beaconchain.load_journal(tmp_path / 'journal.jsonl', tmp_path / 'none.pkl')) == [4]
+
+
+def test_resumes_from_journal(stub, sleeps, tmp_path):
+    journal_path = tmp_path / 'journal.jsonl'
+    _fetch(stub, [10, 11], journal_path)
+    # a crash mid-write leaves a partial last line
+    with open(journal_path, 'a') as f:
+        f.write('{"slot": 12, "da')
+
+    d = beaconchain.load_journal(journal_path, tmp_path / 'none.pkl')
+    assert sorted(d) == [10, 11]
+    stub.requests.clear()
+    d.update(_fetch(stub, [s for s in range(10, 15) if s not in d], journal_path))
+
+    assert sorted(d) == [10, 11, 12, 13, 14]
+    assert not any(r.endswith(('/10', '/11')) for r in stub.requests)
+    assert beaconchain.load_journal(journal_path, tmp_path / 'none.pkl') == d
+
+
+def test_interrupt_cancels_queued_slots(stub, sleeps, tmp_path, monkeypatch):
+    fetched = []
+    real_fetch = beaconchain.fetch_slot_relay
+
+    def fetch_then_interrupt(slot, *args):
+        fetched.append(slot)
+        if slot == 0:
+            raise KeyboardInterrupt
+        return real_fetch(slot, *args)
+
+    monkeypatch.setattr(beaconchain, 'fetch_slot_relay', fetch_then_interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        _fetch(stub, range(1000), tmp_path / 'journal.jsonl')
+    # only the first window was ever queued; nothing more is fetched after the interrupt
+    assert len(fetched) <= beaconchain.WINDOW_PER_WORKER * 4
@@ -0,0 +1,22 @@
+"""RunReport's json output"""
+import json
+
+import numpy as np
+import pytest
+
+from instrument import RunReport
+
+
+def test_non_finite_numbers_are_written_as_null(tmp_path):
+    report = RunReport(bucket='week')
+    with report.stage('ingest', 10) as st:
+        st['rows_out'] = np.int64(8)
+    report.headline = {'3a_eth_lost': np.float64(1.5), 'bid2reward': float('nan'),
+                       'vanilla_mev_ratio': np.inf, 'by_bucket': [np.float64(-np.inf), 2.0]}
+    with open(report.write(tmp_path), 'r') as f:
+        # NaN and Infinity aren't json; python would read them back without this
+        written = json.load(f, parse_constant=lambda name: pytest.fail(f'{name} in the report'))
+    assert written['headline'] == {'3a_eth_lost': 1.5, 'bid2reward': None,
+                                   'vanilla_mev_ratio': None, 'by_bucket': [None, 2.0]}
+    assert written['stages']['ingest']['rows_out'] == 8
+    assert written['bucket'] == 'week'
@@ -0,0 +1,39 @@
+"""build_node_index and NodeIndex on a handful of slots"""
+import numpy as np
+import pandas as pd
+
+from node_index import NodeIndex, build_node_index
+
+CHECKSUMMED = '0x3c80c0a64E6e491F390c30ACC7114Bb431dC17aC'
+
+
+def test_addresses_are_case_insensitive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame({
+        'slot': [1, 2, 3, 4],
+        'is_rocketpool': pd.array([True, True, True, False], dtype='boolean'),
+        'node_address': pd.Categorical([CHECKSUMMED, CHECKSUMMED.lower(), '0xABC', None]),
+        'is_vanilla': [False, True, False, True],
+        'correct_fee_recipient': pd.array([False, True, True, None], dtype='boolean'),
+        'in_smoothing_pool': pd.array([False] * 4, dtype='boolean'),
+        'max_bid': [0.1, np.nan, 0.1, np.nan],
+        'mev_reward': [0.1, np.nan, 0.1, np.nan],
+        'priority_fees': [0.01] * 4,
+        'reth_portion': [0.5] * 4,
+    }).set_index('slot')
+    mevboost_losses = pd.DataFrame({'lost_eth': [0.05]}, index=pd.Index([1], name='slot'))
+    vanilla_losses = pd.DataFrame({'lost_eth_bad_recipient': [np.nan],
+                                   'lost_eth_bid_estimate': [0.02],
+                                   'lost_eth_nobid_neighborestimate': [np.nan]},
+                                  index=pd.Index([2], name='slot'))
+    build_node_index(df, mevboost_losses, vanilla_losses)
+
+    index = NodeIndex()
+    # both spellings in the csvs are one node, found whatever the case asked for
+    assert list(index.nodes['node_address']) == ['0x3c80c0a64e6e491f390c30acc7114bb431dc17ac',
+                                                 '0xabc']
+    for address in (CHECKSUMMED, CHECKSUMMED.lower(), CHECKSUMMED.upper().replace('0X', '0x')):
+        summary = index.summary(address)
+        assert summary['proposals'] == 2 and summary['lost_eth_wrong_recipient'] == 0.05
+        assert summary['lost_eth_vanilla'] == 0.02
+    assert list(index.proposals('0xAbC').index) == [3]
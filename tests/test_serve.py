@@ -0,0 +1,110 @@
+"""serve.py on a small synthetic.py run, offline"""
+from contextlib import chdir
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pandas as pd
+import pytest
+
+import analysis
+import serve
+from synthetic import generate
+
+N_SLOTS = 3000
+
+
+@pytest.fixture(scope='module')
+def run_dir(tmp_path_factory):
+    """a synthetic data directory with one analysis.py run done in it"""
+    path = tmp_path_factory.mktemp('run')
+    generate(path / 'data', N_SLOTS, n_nodes=50)
+    (path / 'results').mkdir()
+    with chdir(path):
+        analysis.main(plots=False, bootstrap=False)
+    return path
+
+
+@pytest.fixture(scope='module')
+def snapshot(run_dir):
+    return serve.Snapshot(serve.latest_report(run_dir / 'reports'), run_dir / 'data/node_index',
+                          run_dir / 'results')
+
+
+def test_headline_is_the_run_report(snapshot, run_dir):
+    with open(serve.latest_report(run_dir / 'reports'), 'r') as f:
+        report = json.load(f)
+    headline = serve.query(snapshot, '/headline')
+    assert headline['headline']['3a_eth_lost'] == report['headline']['3a_eth_lost']
+    assert headline['start_slot'] == analysis.PENALTY_START_SLOT
+    assert 'stages' not in headline
+
+
+def test_nodes_and_slots(snapshot, run_dir):
+    vanilla = pd.read_csv(run_dir / 'results/vanilla_losses.csv', index_col='slot')
+    slot = int(vanilla.index[0])
+    record = serve.query(snapshot, f'/slots/{slot}')
+    assert record['slot'] == slot and record['is_vanilla']
+    assert record['node_address'] == vanilla.loc[slot, 'node_address'].lower()
+
+    # any case finds the node, and its proposals include the slot
+    node = serve.query(snapshot, f'/nodes/{record["node_address"].upper().replace("0X", "0x")}')
+    assert node['node_address'] == record['node_address']
+    proposals = serve.query(snapshot, f'/nodes/{record["node_address"].lower()}/proposals')
+    assert len(proposals) == node['proposals']
+    assert slot in [p['slot'] for p in proposals]
+
+    with pytest.raises(KeyError):
+        serve.query(snapshot, '/slots/1')
+    with pytest.raises(KeyError):
+        serve.query(snapshot, '/nodes/0x0')
+    with pytest.raises(ValueError):
+        serve.query(snapshot, '/slots/abc')
+
+
+def test_losses_match_the_csvs(snapshot, run_dir):
+    mevboost = pd.read_csv(run_dir / 'results/recipient_losses.csv', index_col='slot')
+    vanilla = pd.read_csv(run_dir / 'results/vanilla_losses.csv', index_col='slot')
+    total = serve.query(snapshot, '/losses')
+    assert total['lost_eth_mevboost_recipient'] == pytest.approx(mevboost['lost_eth'].sum())
+    assert total['lost_eth_vanilla_recipient'] == pytest.approx(
+        vanilla['lost_eth_bad_recipient'].sum())
+
+    # a sub-range, and one hanging over the end, which is clipped
+    mid = analysis.PENALTY_START_SLOT + N_SLOTS // 2
+    first = serve.query(snapshot, '/losses', {'to_slot': str(mid)})
+    rest = serve.query(snapshot, '/losses', {'from_slot': str(mid + 1), 'to_slot': '999999999'})
+    assert rest['to_slot'] == snapshot.end_slot
+    assert first['rp_proposals'] + rest['rp_proposals'] == total['rp_proposals']
+    assert first['lost_eth_total'] + rest['lost_eth_total'] == pytest.approx(
+        total['lost_eth_total'])
+
+
+@pytest.mark.parametrize('params', [
+    {'from_slot': '5204000', 'to_slot': '5203900'},  # inverted
+    {'from_slot': '1', 'to_slot': '2'},  # before the analysed range
+    {'from_slot': '5203700', 'from_date': '2022-11-25'},  # both
+    {'to_date': '25/11/2022'},
+])
+def test_bad_ranges_are_rejected(snapshot, params):
+    with pytest.raises(ValueError):
+        serve.query(snapshot, '/losses', params)
+
+
+def test_http(run_dir, monkeypatch):
+    monkeypatch.chdir(run_dir)
+    server = serve.make_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    try:
+        with urlopen(f'{url}/headline') as r:
+            assert r.status == 200 and 'headline' in json.load(r)
+        for path, status in (('/losses?from_slot=5204000&to_slot=5203900', 400),
+                             ('/slots/1', 404), ('/nope', 404)):
+            with pytest.raises(HTTPError) as e:
+                urlopen(url + path)
+            assert e.value.code == status and 'error' in json.load(e.value)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,23 @@
+"""shard selection from the csv file names"""
+import pytest
+
+from slot_data import select_shards, shard_index
+
+
+def _touch(data_dir, *ranges):
+    for first, last in ranges:
+        (data_dir / f'rockettheft_slot-{first}-to-{last}.csv').touch()
+
+
+def test_shard_index_sorts_and_allows_gaps(tmp_path):
+    _touch(tmp_path, (200, 299), (0, 99))
+    (tmp_path / 'notes.csv').touch()
+    shards = shard_index(tmp_path)
+    assert [(first, last) for first, last, _p in shards] == [(0, 99), (200, 299)]
+    assert [(first, last) for first, last, _p in select_shards(shards, 150, None)] == [(200, 299)]
+
+
+def test_overlapping_shards_are_rejected(tmp_path):
+    _touch(tmp_path, (0, 99), (100, 199), (150, 249))
+    with pytest.raises(ValueError, match='by 50 slots'):
+        shard_index(tmp_path)
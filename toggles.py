@@ -0,0 +1,89 @@
+"""Run-length encoding of each node's proposals, to find nodes that toggle behaviour
+
+Proposals are sorted by (node, slot) once, and every sequence of interest (vanilla vs MEV-boost,
+right vs wrong fee recipient) is run-length encoded with array diffs, so there's no per-node or
+per-slot python loop however many proposals there are.
+"""
+import numpy as np
+import pandas as pd
+
+
+def run_lengths(groups, values):
+    """(start positions, lengths) of the runs of equal consecutive values within each group
+
+    groups must already be sorted, so each group is contiguous
+    """
+    n = len(values)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = (groups[1:] != groups[:-1]) | (values[1:] != values[:-1])
+    idx = np.flatnonzero(starts)
+    return idx, np.diff(np.append(idx, n))
+
+
+def toggle_stats(groups, values, n_groups):
+    """per-group switch counts and longest True/False streaks of a boolean sequence
+
+    Returns (switches, longest_true, longest_false, switch_positions), where switch_positions are
+    the positions whose value differs from the previous one in the same group
+    """
+    idx, lengths = run_lengths(groups, values)
+    run_group = groups[idx]
+    is_switch = np.zeros(len(idx), dtype=bool)
+    is_switch[1:] = run_group[1:] == run_group[:-1]
+    switches = np.bincount(run_group[is_switch], minlength=n_groups)
+
+    longest_true = np.zeros(n_groups, dtype=np.int64)
+    longest_false = np.zeros(n_groups, dtype=np.int64)
+    run_value = values[idx]
+    np.maximum.at(longest_true, run_group[run_value], lengths[run_value])
+    np.maximum.at(longest_false, run_group[~run_value], lengths[~run_value])
+    return switches, longest_true, longest_false, idx[is_switch]
+
+
+def detect_toggles(df):
+    """per-node toggle summary and the list of transitions, for RP proposals in df
+
+    Two sequences are encoded per node: vanilla vs MEV-boost over all its proposals, and wrong vs
+    right fee recipient over the proposals where that's known
+    """
+    addresses = df['node_address'].cat.remove_unused_categories()
+    codes = addresses.cat.codes.to_numpy()
+    slots = df.index.to_numpy()
+    order = np.lexsort((slots, codes))
+    codes, slots = codes[order], slots[order]
+    n_nodes = len(addresses.cat.categories)
+
+    summary = pd.DataFrame(index=pd.Index(addresses.cat.categories, name='node_address'))
+    summary['proposals'] = np.bincount(codes, minlength=n_nodes)
+    transitions = []
+
+    is_vanilla = df['is_vanilla'].to_numpy(dtype=bool)[order]
+    switches, longest_vanilla, longest_mev, pos = toggle_stats(codes, is_vanilla, n_nodes)
+    summary['vanilla_mev_toggles'] = switches
+    summary['longest_vanilla_streak'] = longest_vanilla
+    summary['longest_mev_streak'] = longest_mev
+    transitions.append(pd.DataFrame({
+        'node_address': addresses.cat.categories[codes[pos]],
+        'slot': slots[pos],
+        'kind': 'vanilla_mev',
+        'to': np.where(is_vanilla[pos], 'vanilla', 'mev'),
+    }))
+
+    rcpt = df['correct_fee_recipient'].to_numpy(dtype='float', na_value=np.nan)[order]
+    known = ~np.isnan(rcpt)
+    wrong = rcpt[known] == 0
+    switches, longest_wrong, longest_right, pos = toggle_stats(codes[known], wrong, n_nodes)
+    summary['recipient_toggles'] = switches
+    summary['longest_wrong_recipient_streak'] = longest_wrong
+    summary['longest_right_recipient_streak'] = longest_right
+    transitions.append(pd.DataFrame({
+        'node_address': addresses.cat.categories[codes[known][pos]],
+        'slot': slots[known][pos],
+        'kind': 'recipient',
+        'to': np.where(wrong[pos], 'wrong', 'right'),
+    }))
+
+    summary = summary.sort_index()
+    transitions = pd.concat(transitions, ignore_index=True).sort_values(['node_address', 'slot'],
+                                                                       kind='stable')
+    return summary, transitions.reset_index(drop=True)